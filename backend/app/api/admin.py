@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Query
+
+from ..services import game
+from ..services.limits import address_limiter, admission, rate_limiter
+from ..services.search import element_index
+from ..services.stats import stats_aggregator
+
+router = APIRouter()
+
+
+@router.get("/cache")
+def get_cache_stats() -> dict:
+    return {"combinations": game.combination_cache.snapshot()}
+
+
+@router.get("/limits")
+def get_limits() -> dict:
+    return {
+        "active_buckets": len(rate_limiter),
+        "active_address_buckets": len(address_limiter),
+        "admission": admission.snapshot(),
+    }
+
+
+@router.get("/stats")
+def get_stats(limit: int = Query(default=20, ge=1, le=100)) -> dict:
+    return {
+        "total_combinations": stats_aggregator.total,
+        "top_elements": [
+            {**_describe(element_id), "count": count}
+            for element_id, count in stats_aggregator.elements.top(limit)
+        ],
+        "top_pairs": [
+            {"element_a": _describe(a_id), "element_b": _describe(b_id), "count": count}
+            for (a_id, b_id), count in stats_aggregator.pairs.top(limit)
+        ],
+        "per_minute": [
+            {"start": start, "count": count} for start, count in stats_aggregator.timeline()
+        ],
+    }
+
+
+@router.get("/stats/pair")
+def get_pair_stats(element_a_id: int, element_b_id: int) -> dict:
+    return {
+        "element_a": _describe(element_a_id),
+        "element_b": _describe(element_b_id),
+        "estimated_count": stats_aggregator.estimate_pair(element_a_id, element_b_id),
+    }
+
+
+def _describe(element_id: int) -> dict:
+    element = element_index.get(element_id)
+    if element is None:
+        return {"id": element_id}
+    return {"id": element.id, "name_tr": element.name, "emoji": element.emoji}
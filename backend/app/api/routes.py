@@ -1,36 +1,217 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import select
+import json
+from typing import AsyncIterator
 
-from ..database import get_session
-from ..models import Element
-from ..schemas import CombineRequest, CombineResponse, ElementSummary, ElementsResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from ..schemas import (
+    CombineRequest,
+    CombineResponse,
+    ElementsResponse,
+    ElementSummary,
+    RecipeResponse,
+    RecipeSourcesResponse,
+    RecipeStep,
+    SessionResponse,
+)
 from ..services import game
+from ..services.limits import OverloadedError, RateLimitExceeded
+from ..services.metrics import metrics
+from ..services.recipes import recipe_graph
+from ..services.search import IndexedElement, element_index
+from ..services.sessions import session_store
 
 router = APIRouter()
 
 
+@router.post("/session", response_model=SessionResponse)
+async def create_session() -> SessionResponse:
+    return SessionResponse(sessionId=session_store.create())
+
+
 @router.get("/elements", response_model=ElementsResponse)
-def get_elements(q: str | None = None) -> ElementsResponse:
-    with get_session() as db:
-        query = select(Element).order_by(Element.is_seed.desc(), Element.id)
-        elements = db.exec(query).all()
-        if q:
-            lowered = q.casefold()
-            elements = [el for el in elements if lowered in el.name_tr.casefold()]
-        summaries = [
-            ElementSummary(id=el.id, name_tr=el.name_tr, emoji=el.emoji, is_seed=el.is_seed)
-            for el in elements
-        ]
-        return ElementsResponse(elements=summaries)
+async def get_elements(
+    request: Request,
+    q: str | None = None,
+    cursor: int | None = None,
+    since: str | None = None,
+    sessionId: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+) -> Response:
+    element_index.sync()
+    version = element_index.version
+    if sessionId:
+        page, next_cursor = element_index.search_within(
+            session_store.discovered(sessionId), q, cursor=cursor, limit=limit
+        )
+        return _elements_response(page, next_cursor, version, {"Cache-Control": "no-store"})
+
+    # A page is fully determined by the query parameters and the catalog version.
+    etag = f'W/"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    if since is not None:
+        page, removed, next_cursor, reset = element_index.since(since, limit=limit)
+        return _elements_response(page, next_cursor, version, headers, removed=removed, reset=reset)
+    page, next_cursor = element_index.search(q, cursor=cursor, limit=limit)
+    return _elements_response(page, next_cursor, version, headers)
+
+
+@router.get("/session/{session_id}/shared/{other_session_id}", response_model=ElementsResponse)
+async def get_shared_elements(
+    session_id: str,
+    other_session_id: str,
+    cursor: int | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+) -> Response:
+    element_index.sync()
+    shared = session_store.common(session_id, other_session_id)
+    page, next_cursor = element_index.search_within(shared, cursor=cursor, limit=limit)
+    return _elements_response(page, next_cursor, element_index.version, {"Cache-Control": "no-store"})
 
 
 @router.post("/combine", response_model=CombineResponse)
-async def combine(payload: CombineRequest) -> CombineResponse:
+async def combine(payload: CombineRequest, request: Request) -> Response:
     try:
-        return await game.combine_elements(payload.elementA, payload.elementB)
+        result = await game.combine_elements(
+            payload.elementA, payload.elementB, payload.sessionId, client_address=_client_address(request)
+        )
     except ValueError as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except (RateLimitExceeded, OverloadedError) as exc:
+        raise _limit_error(exc) from exc
+    with metrics.timer("serialization"):
+        body = result.model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/combine/stream")
+async def combine_stream(payload: CombineRequest, request: Request) -> StreamingResponse:
+    """Server-Sent Events variant of ``/combine``: ``emoji``, ``name``, then ``result`` (or ``error``)."""
+    events = game.combine_elements_stream(
+        payload.elementA, payload.elementB, payload.sessionId, client_address=_client_address(request)
+    )
+    try:
+        first = await anext(events)
+    except ValueError as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except (RateLimitExceeded, OverloadedError) as exc:
+        raise _limit_error(exc) from exc
+    return StreamingResponse(
+        _sse(first, events),
+        media_type="text/event-stream",
+        # "identity" keeps GZipMiddleware from buffering the events.
+        headers={"Cache-Control": "no-store", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
+
+def _client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _limit_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, RateLimitExceeded):
+        return HTTPException(status_code=429, detail=str(exc))
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+async def _sse(first: tuple[str, dict], rest: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[bytes]:
+    event, data = first
+    yield _sse_event(event, data)
+    async for event, data in rest:
+        yield _sse_event(event, data)
+
+
+def _sse_event(event: str, data: dict) -> bytes:
+    with metrics.timer("serialization"):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+@router.get("/recipes/reachable", response_model=ElementsResponse)
+async def get_reachable_elements(
+    sessionId: str,
+    steps: int | None = Query(default=None, ge=1),
+    cursor: int | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+) -> Response:
+    """Elements the session does not have yet but can make with known combinations."""
+    element_index.sync()
+    recipe_graph.sync()
+    reachable = recipe_graph.reachable(session_store.discovered(sessionId), max_steps=steps)
+    page, next_cursor = element_index.search_within(sorted(reachable), cursor=cursor, limit=limit)
+    return _elements_response(page, next_cursor, element_index.version, {"Cache-Control": "no-store"})
+
+
+@router.get("/recipes/{element_id}", response_model=RecipeResponse)
+async def get_recipe(element_id: int) -> RecipeResponse:
+    """Shortest way to make an element from the seed elements."""
+    recipe_graph.sync()
+    steps = recipe_graph.recipe(element_id)
+    if steps is None:
+        raise HTTPException(status_code=404, detail="Bu öğe için tarif bulunamadı")
+    return RecipeResponse(
+        element=_summary(element_id),
+        depth=recipe_graph.depth[element_id],
+        steps=[_recipe_step(*step) for step in steps],
+    )
+
+
+@router.get("/recipes/{element_id}/sources", response_model=RecipeSourcesResponse)
+async def get_recipe_sources(
+    element_id: int, limit: int = Query(default=50, ge=1, le=500)
+) -> RecipeSourcesResponse:
+    """Known pairs that produce an element."""
+    recipe_graph.sync()
+    return RecipeSourcesResponse(
+        element=_summary(element_id),
+        sources=[_recipe_step(a_id, b_id, element_id) for a_id, b_id in recipe_graph.sources(element_id, limit)],
+    )
+
+
+def _summary(element_id: int) -> ElementSummary:
+    element = element_index.get(element_id)
+    if element is None:
+        element_index.sync(force=True)
+        element = element_index.get(element_id)
+    if element is None:
+        raise HTTPException(status_code=404, detail="Öğe bulunamadı")
+    return ElementSummary(id=element.id, name_tr=element.name, emoji=element.emoji, is_seed=element.is_seed)
+
+
+def _recipe_step(element_a_id: int, element_b_id: int, result_id: int) -> RecipeStep:
+    return RecipeStep(
+        elementA=_summary(element_a_id), elementB=_summary(element_b_id), result=_summary(result_id)
+    )
 
 
+def _elements_response(
+    page: list[IndexedElement],
+    next_cursor: int | str | None,
+    version: str,
+    headers: dict,
+    removed: list[int] | None = None,
+    reset: bool = False,
+) -> Response:
+    # Elements carry pre-serialized JSON, so the body is assembled without
+    # building a pydantic model per row.
+    with metrics.timer("serialization"):
+        body = b"".join(
+            (
+                b'{"elements":[',
+                b",".join(el.payload for el in page),
+                b'],"next_cursor":',
+                json.dumps(next_cursor).encode(),
+                b',"version":',
+                json.dumps(version).encode(),
+                b',"removed":[',
+                ",".join(map(str, removed or ())).encode(),
+                b'],"reset":',
+                b"true" if reset else b"false",
+                b"}",
+            )
+        )
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -10,8 +10,53 @@ class Settings(BaseSettings):
     gemini_api_key: str | None = None
     gemini_model: str = "gemini-2.0-flash-lite"
     gemini_endpoint: str = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    gemini_stream_endpoint: str = (
+        "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent?alt=sse"
+    )
     gemini_timeout_seconds: int = 20
+    gemini_max_concurrency: int = 8
+    gemini_max_retries: int = 2
+    gemini_retry_backoff_seconds: float = 0.5
+    gemini_breaker_failure_threshold: int = 5
+    gemini_breaker_reset_seconds: float = 30.0
+    gemini_batch_window_ms: int = 25
+    gemini_batch_max_size: int = 8
     cors_origins: list[str] = ["*"]
+    database_pool_size: int = 8
+    database_write_batch_size: int = 64
+    combination_cache_size: int = 10_000
+    search_sync_interval_seconds: float = 1.0
+    precompute_enabled: bool = False
+    precompute_daily_budget: int = 500
+    precompute_max_per_minute: int = 30
+    precompute_max_queue: int = 10_000
+    precompute_idle_poll_seconds: float = 0.5
+    stats_top_capacity: int = 256
+    stats_warmup_events: int = 100_000
+    stats_flush_interval_seconds: float = 10.0
+    stats_rollup_interval_seconds: float = 3600.0
+    session_cache_size: int = 50_000
+    session_flush_interval_seconds: float = 5.0
+    recipe_snapshot_path: str = str(Path(__file__).resolve().parent.parent / "recipe_graph.bin")
+    recipe_snapshot_interval_seconds: float = 300.0
+    rate_limit_per_day: int = 60
+    # Shared by every session from one client address, so ids a client makes up do not multiply
+    # its budget. Off (0) by default: behind a proxy or carrier NAT many players share an address.
+    rate_limit_per_address_per_day: int = 0
+    rate_limit_shards: int = 16
+    rate_limit_max_buckets: int = 100_000
+    rate_limit_checkpoint_seconds: float = 30.0
+    # In batch slots; defaults to gemini_max_concurrency * gemini_batch_max_size.
+    admission_capacity: int | None = None
+    admission_max_queue: int = 256
+    admission_max_wait_seconds: float = 10.0
+    moderation_enabled: bool = True
+    # "serve_then_flag" or "block_until_verdict"
+    moderation_policy: str = "serve_then_flag"
+    moderation_blocklist_path: str | None = None
+    moderation_cache_size: int = 50_000
+    moderation_batch_window_ms: int = 200
+    moderation_batch_max_size: int = 20
 
     model_config = SettingsConfigDict(env_file=(Path(__file__).resolve().parent.parent / ".env"))
 
@@ -1,12 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+import logging
 from contextlib import contextmanager
-from typing import Iterator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional, TypeVar
 
+from sqlalchemy import event
 from sqlmodel import Session, SQLModel, create_engine
 
 from .config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
-engine = create_engine(settings.database_url, echo=False, connect_args={"check_same_thread": False})
+
+T = TypeVar("T")
+
+# SQLite's default cap on bound parameters per statement before 3.32.
+MAX_BOUND_PARAMETERS = 999
+
+_is_sqlite = settings.database_url.startswith("sqlite")
+
+
+def _create_engine(pool_size: int, begin: str):
+    options: dict[str, Any] = {}
+    if _is_sqlite:
+        options["connect_args"] = {"check_same_thread": False, "timeout": 30}
+        if ":memory:" not in settings.database_url:
+            options["pool_size"] = pool_size
+    created = create_engine(settings.database_url, echo=False, **options)
+    if _is_sqlite:
+        event.listen(created, "connect", _configure_sqlite)
+        event.listen(created, "begin", lambda connection: connection.exec_driver_sql(begin))
+    return created
+
+
+def _configure_sqlite(dbapi_connection, _record) -> None:
+    # Let SQLAlchemy emit BEGIN itself; pysqlite's implicit transactions
+    # break SAVEPOINT, which the writer uses to isolate failing jobs.
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")
+    cursor.close()
+
+
+# Readers share a pool; with WAL they never block, or are blocked by, the writer.
+engine = _create_engine(settings.database_pool_size, "BEGIN")
+# The writer takes the write lock up front so a batch never fails halfway
+# through on a lock upgrade.
+write_engine = _create_engine(1, "BEGIN IMMEDIATE")
 
 
 def init_db() -> None:
@@ -17,3 +63,112 @@ def init_db() -> None:
 def get_session() -> Iterator[Session]:
     with Session(engine) as session:
         yield session
+
+
+def chunked_rows(rows: list[dict]) -> Iterator[list[dict]]:
+    """Split multi-row INSERT values into chunks that stay below the bound-parameter cap."""
+    if not rows:
+        return
+    size = max(1, MAX_BOUND_PARAMETERS // len(rows[0]))
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+@dataclass
+class _WriteJob:
+    fn: Callable[[Session], Any]
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+class DatabaseWriter:
+    """Single writer that group-commits queued write jobs.
+
+    Every job is a function taking a ``Session``. Jobs waiting in the queue
+    are run together in one transaction on a worker thread, each inside its
+    own savepoint so one failing job does not undo the others, and the batch
+    is committed once. Callers get the job's return value (or exception)
+    after the commit. Sessions do not expire objects on commit, so jobs may
+    return the ORM objects they wrote.
+    """
+
+    def __init__(self, max_batch: int) -> None:
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue[_WriteJob]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.jobs = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Commit everything already queued, then stop the writer task."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+
+    async def submit(self, fn: Callable[[Session], T]) -> T:
+        """Queue a write and wait until it is committed."""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_WriteJob(fn, future))
+        return await future
+
+    def submit_nowait(self, fn: Callable[[Session], Any]) -> None:
+        """Queue a write nobody waits for, such as a log entry."""
+        self._enqueue(_WriteJob(fn))
+
+    def _enqueue(self, job: _WriteJob) -> None:
+        self.start()
+        self._queue.put_nowait(job)
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                outcomes = await asyncio.to_thread(self._commit, batch)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Write batch of %d jobs failed", len(batch))
+                outcomes = [(False, exc)] * len(batch)
+            for job, (ok, value) in zip(batch, outcomes):
+                if job.future is not None and not job.future.done():
+                    if ok:
+                        job.future.set_result(value)
+                    else:
+                        job.future.set_exception(value)
+                elif not ok:
+                    logger.warning("Background write failed: %s", value)
+                queue.task_done()
+
+    def _commit(self, batch: list[_WriteJob]) -> list[tuple[bool, Any]]:
+        outcomes: list[tuple[bool, Any]] = []
+        with Session(write_engine, expire_on_commit=False) as session:
+            for job in batch:
+                savepoint = session.begin_nested()
+                try:
+                    value = job.fn(session)
+                    session.flush()
+                    savepoint.commit()
+                except Exception as exc:  # noqa: BLE001
+                    savepoint.rollback()
+                    outcomes.append((False, exc))
+                else:
+                    outcomes.append((True, value))
+            session.commit()
+        self.batches += 1
+        self.jobs += len(batch)
+        return outcomes
+
+
+writer = DatabaseWriter(max_batch=settings.database_write_batch_size)
@@ -3,12 +3,24 @@ from __future__ import annotations
 import logging
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
+from .api.admin import router as admin_router
 from .api.routes import router as api_router
 from .config import get_settings
-from .database import init_db
+from .database import init_db, writer
 from .seed import seed_base_elements
+from .services import game, gemini
+from .services.limits import address_limiter, rate_limiter
+from .services.metrics import metrics
+from .services.moderation import moderator
+from .services.precompute import precompute_worker
+from .services.recipes import recipe_graph
+from .services.search import element_index
+from .services.sessions import session_store
+from .services.stats import stats_aggregator
 
 logging.basicConfig(level=logging.INFO)
 settings = get_settings()
@@ -21,13 +33,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 @app.on_event("startup")
 def startup() -> None:
     init_db()
     seed_base_elements()
+    element_index.sync(force=True)
+    recipe_graph.warm_up()
+    stats_aggregator.warm_up()
+
+
+@app.on_event("startup")
+async def start_background_workers() -> None:
+    stats_aggregator.start()
+    session_store.start()
+    recipe_graph.start()
+    rate_limiter.start()
+    address_limiter.start()
+    if settings.precompute_enabled and settings.gemini_api_key:
+        precompute_worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await precompute_worker.stop()
+    await moderator.stop()
+    await stats_aggregator.stop()
+    await session_store.stop()
+    await recipe_graph.stop()
+    await rate_limiter.stop()
+    await address_limiter.stop()
+    await writer.stop()
+    await gemini.close_client()
 
 
 @app.get("/health")
@@ -35,4 +76,10 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> str:
+    return metrics.render(game.combination_cache.snapshot())
+
+
 app.include_router(api_router, prefix="/api")
+app.include_router(admin_router, prefix="/admin")
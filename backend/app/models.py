@@ -24,3 +24,52 @@ class Combination(SQLModel, table=True):
     element_b_id: int = Field(foreign_key="elements.id")
     result_element_id: int = Field(foreign_key="elements.id")
     order_key: str = Field(index=True)
+
+
+class CombinationLog(SQLModel, table=True):
+    __tablename__ = "combination_logs"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    element_a_id: int = Field(foreign_key="elements.id")
+    element_b_id: int = Field(foreign_key="elements.id")
+    result_element_id: int = Field(foreign_key="elements.id")
+    created_at: int = Field(index=True)  # Unix seconds
+
+
+class StatsBucket(SQLModel, table=True):
+    __tablename__ = "stats_buckets"
+    __table_args__ = (UniqueConstraint("resolution", "bucket_start", name="uq_stats_bucket"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    resolution: int
+    bucket_start: int = Field(index=True)
+    count: int = Field(default=0)
+
+
+class SessionProgress(SQLModel, table=True):
+    __tablename__ = "session_progress"
+
+    session_id: str = Field(primary_key=True)
+    # CompactBitmap.to_bytes() of the discovered element ids.
+    discovered: bytes = Field(default=b"")
+    updated_at: int = Field(default=0)  # Unix seconds
+
+
+class ModerationVerdict(SQLModel, table=True):
+    __tablename__ = "moderation_verdicts"
+
+    # moderation_key() of the element name.
+    key: str = Field(primary_key=True)
+    is_safe: bool
+    reason: str = Field(default="")
+    # Set when an already stored element was retracted because of this verdict.
+    element_id: Optional[int] = Field(default=None, index=True)
+    created_at: int = Field(default=0)  # Unix seconds
+
+
+class RateLimitBucket(SQLModel, table=True):
+    __tablename__ = "rate_limit_buckets"
+
+    key: str = Field(primary_key=True)
+    tokens: float
+    updated_at: float = Field(index=True)  # Unix seconds
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Optional, Union
+
 from pydantic import BaseModel
 
 
@@ -12,11 +14,18 @@ class ElementSummary(BaseModel):
 
 class ElementsResponse(BaseModel):
     elements: list[ElementSummary]
+    # An element id, or on ``since=`` deltas the revision to ask for next.
+    next_cursor: Optional[Union[int, str]] = None
+    version: str = ""
+    # Set on ``since=`` deltas: ids to drop, and whether to drop everything first.
+    removed: list[int] = []
+    reset: bool = False
 
 
 class CombineRequest(BaseModel):
     elementA: str
     elementB: str
+    sessionId: Optional[str] = None
 
 
 class GeminiElementResponse(BaseModel):
@@ -27,3 +36,25 @@ class GeminiElementResponse(BaseModel):
 class CombineResponse(BaseModel):
     element: ElementSummary
     created: bool
+    isNewElementForSession: bool = False
+
+
+class SessionResponse(BaseModel):
+    sessionId: str
+
+
+class RecipeStep(BaseModel):
+    elementA: ElementSummary
+    elementB: ElementSummary
+    result: ElementSummary
+
+
+class RecipeResponse(BaseModel):
+    element: ElementSummary
+    depth: int
+    steps: list[RecipeStep]
+
+
+class RecipeSourcesResponse(BaseModel):
+    element: ElementSummary
+    sources: list[RecipeStep]
@@ -1,8 +1,8 @@
-from sqlmodel import select
+from sqlmodel import update
 
 from .database import get_session
 from .models import Element
-from .services.game import normalize_name
+from .services.game import normalize_name, upsert_elements
 
 SEED_ELEMENTS = [
     {"name": "Su", "emoji": "💧"},
@@ -14,21 +14,15 @@ SEED_ELEMENTS = [
 
 def seed_base_elements() -> None:
     with get_session() as session:
-        for item in SEED_ELEMENTS:
-            normalized = normalize_name(item["name"])
-            existing = session.exec(
-                select(Element).where(Element.normalized_name == normalized)
-            ).one_or_none()
-            if existing:
-                if not existing.is_seed:
-                    existing.is_seed = True
-                    session.add(existing)
-                continue
-            element = Element(
-                name=item["name"],
-                normalized_name=normalized,
-                emoji=item["emoji"],
-                is_seed=True,
-            )
-            session.add(element)
+        upsert_elements(
+            session,
+            [(item["name"], item["emoji"]) for item in SEED_ELEMENTS],
+            is_seed=True,
+        )
+        # Seed names that already existed as generated elements become seeds.
+        session.exec(
+            update(Element)
+            .where(Element.normalized_name.in_([normalize_name(item["name"]) for item in SEED_ELEMENTS]))
+            .values(is_seed=True)
+        )
         session.commit()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ..config import get_settings
+from ..models import Element
+from ..schemas import GeminiElementResponse
+from . import gemini
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class _PendingPair:
+    element_a: Element
+    element_b: Element
+    future: asyncio.Future = field(repr=False)
+
+
+class GeminiBatcher:
+    """Collects uncached pairs for a short window and generates them in one model call.
+
+    A batch is sent when ``max_size`` pairs are waiting or ``window_seconds``
+    after its first pair arrived, whichever comes first. Pairs the model
+    answers ambiguously are retried as single-pair calls.
+    """
+
+    def __init__(self, window_seconds: float, max_size: int) -> None:
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._pending: list[_PendingPair] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def generate(self, element_a: Element, element_b: Element) -> GeminiElementResponse:
+        if self.max_size <= 1 or self.window_seconds <= 0:
+            return await gemini.call_gemini(element_a, element_b)
+
+        loop = asyncio.get_running_loop()
+        item = _PendingPair(element_a, element_b, loop.create_future())
+        self._pending.append(item)
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await item.future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[_PendingPair]) -> None:
+        batch = [item for item in batch if not item.future.done()]
+        if len(batch) == 1:
+            await self._run_single(batch[0])
+            return
+        if not batch:
+            return
+
+        prompt = gemini.build_batch_prompt([(item.element_a, item.element_b) for item in batch])
+        try:
+            text = await gemini.get_client().generate_text(prompt)
+        except Exception as exc:  # noqa: BLE001
+            for item in batch:
+                _settle(item.future, exception=exc)
+            return
+
+        with metrics.timer("parse"):
+            results = gemini.parse_batch_response(text, len(batch))
+        retries = []
+        for item, result in zip(batch, results):
+            if result is None:
+                retries.append(item)
+            else:
+                _settle(item.future, result=result)
+        if retries:
+            logger.info("Retrying %d of %d batched pairs individually", len(retries), len(batch))
+            await asyncio.gather(*(self._run_single(item) for item in retries))
+
+    async def _run_single(self, item: _PendingPair) -> None:
+        try:
+            result = await gemini.call_gemini(item.element_a, item.element_b)
+        except Exception as exc:  # noqa: BLE001
+            _settle(item.future, exception=exc)
+        else:
+            _settle(item.future, result=result)
+
+
+def _settle(
+    future: asyncio.Future,
+    result: Optional[GeminiElementResponse] = None,
+    exception: Optional[BaseException] = None,
+) -> None:
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+
+batcher = GeminiBatcher(
+    window_seconds=settings.gemini_batch_window_ms / 1000,
+    max_size=settings.gemini_batch_max_size,
+)
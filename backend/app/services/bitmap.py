@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Union
+
+# Ids are split into a 16-bit chunk key and a 16-bit offset. A chunk holds
+# its offsets as a sorted uint16 array while small and switches to a fixed
+# 8 KiB bitmap once that is smaller (more than 4096 members).
+ARRAY_LIMIT = 4096
+BITMAP_BYTES = 1 << 13
+
+_HEADER = struct.Struct("<IBI")
+_ARRAY, _BITMAP = 0, 1
+
+Container = Union[array, bytearray]
+
+
+class CompactBitmap:
+    """Compressed set of non-negative 32-bit integers (a small Roaring bitmap).
+
+    Membership and insertion are O(1) for dense chunks and a binary search
+    over at most 4096 offsets for sparse ones; a set of a few thousand ids
+    costs about two bytes per id.
+    """
+
+    def __init__(self, values: Iterable[int] = ()) -> None:
+        self._chunks: dict[int, Container] = {}
+        self._size = 0
+        for value in values:
+            self.add(value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, value: int) -> bool:
+        chunk = self._chunks.get(value >> 16)
+        return chunk is not None and _contains(chunk, value & 0xFFFF)
+
+    def add(self, value: int) -> bool:
+        """Add ``value``; returns False if it was already present."""
+        key, low = value >> 16, value & 0xFFFF
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            self._chunks[key] = array("H", [low])
+        elif isinstance(chunk, bytearray):
+            mask = 1 << (low & 7)
+            if chunk[low >> 3] & mask:
+                return False
+            chunk[low >> 3] |= mask
+        else:
+            index = bisect_left(chunk, low)
+            if index < len(chunk) and chunk[index] == low:
+                return False
+            chunk.insert(index, low)
+            if len(chunk) > ARRAY_LIMIT:
+                self._chunks[key] = _to_bitmap(chunk)
+        self._size += 1
+        return True
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self._chunks):
+            base = key << 16
+            for low in _offsets(self._chunks[key]):
+                yield base | low
+
+    def __and__(self, other: "CompactBitmap") -> "CompactBitmap":
+        result = CompactBitmap()
+        for key, chunk in self._chunks.items():
+            other_chunk = other._chunks.get(key)
+            if other_chunk is None:
+                continue
+            if isinstance(chunk, bytearray) and isinstance(other_chunk, bytearray):
+                merged = bytearray(a & b for a, b in zip(chunk, other_chunk))
+                count = sum(bin(byte).count("1") for byte in merged)
+                if count > ARRAY_LIMIT:
+                    result._chunks[key] = merged
+                elif count:
+                    result._chunks[key] = array("H", _offsets(merged))
+                result._size += count
+                continue
+            # Probe each offset of the smaller array against the other chunk.
+            if isinstance(chunk, bytearray) or (
+                not isinstance(other_chunk, bytearray) and len(other_chunk) < len(chunk)
+            ):
+                chunk, other_chunk = other_chunk, chunk
+            common = array("H", (low for low in chunk if _contains(other_chunk, low)))
+            if common:
+                result._chunks[key] = common
+                result._size += len(common)
+        return result
+
+    def to_bytes(self) -> bytes:
+        parts = []
+        for key in sorted(self._chunks):
+            chunk = self._chunks[key]
+            if isinstance(chunk, bytearray):
+                parts.append(_HEADER.pack(key, _BITMAP, BITMAP_BYTES))
+                parts.append(bytes(chunk))
+            else:
+                parts.append(_HEADER.pack(key, _ARRAY, len(chunk)))
+                parts.append(chunk.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CompactBitmap":
+        bitmap = cls()
+        offset = 0
+        while offset < len(data):
+            key, kind, length = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            if kind == _BITMAP:
+                chunk: Container = bytearray(data[offset : offset + length])
+                offset += length
+                bitmap._size += sum(bin(byte).count("1") for byte in chunk)
+            else:
+                chunk = array("H")
+                chunk.frombytes(data[offset : offset + 2 * length])
+                offset += 2 * length
+                bitmap._size += length
+            bitmap._chunks[key] = chunk
+        return bitmap
+
+
+def _contains(chunk: Container, low: int) -> bool:
+    if isinstance(chunk, bytearray):
+        return bool(chunk[low >> 3] & (1 << (low & 7)))
+    index = bisect_left(chunk, low)
+    return index < len(chunk) and chunk[index] == low
+
+
+def _offsets(chunk: Container) -> Iterator[int]:
+    if not isinstance(chunk, bytearray):
+        yield from chunk
+        return
+    for index, byte in enumerate(chunk):
+        while byte:
+            lowest = byte & -byte
+            yield (index << 3) | (lowest.bit_length() - 1)
+            byte ^= lowest
+
+
+def _to_bitmap(offsets: array) -> bytearray:
+    chunk = bytearray(BITMAP_BYTES)
+    for low in offsets:
+        chunk[low >> 3] |= 1 << (low & 7)
+    return chunk
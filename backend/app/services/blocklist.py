@@ -0,0 +1,72 @@
+# Terms are matched after moderation_key() normalization, so casing,
+# diacritics, leet digits and repeated letters need not be listed. A term
+# matches whole words; a trailing "*" also matches words it starts, which
+# covers Turkish suffixes ("siktir*" matches "siktirgit").
+BLOCKLIST = [
+    # Küfür ve hakaret
+    "amk",
+    "aq",
+    "amina*",
+    "amcik*",
+    "orospu*",
+    "orosbu*",
+    "pic",
+    "pici*",
+    "piclik*",
+    "siktir*",
+    "sikerim",
+    "sikeyim",
+    "yarrak*",
+    "yarak*",
+    "got",
+    "gotveren*",
+    "ibne*",
+    "pezevenk*",
+    "kahpe*",
+    "serefsiz*",
+    "gavat*",
+    "kevase*",
+    "dalyarak*",
+    # Cinsel içerik
+    "seks",
+    "seksi",
+    "seksuel*",
+    "sex*",
+    "porn*",
+    "sakso*",
+    "masturbasyon*",
+    "fahise*",
+    "genelev*",
+    "erotik*",
+    # Siyasi partiler ve adaylar
+    "akp",
+    "ak parti",
+    "chp",
+    "mhp",
+    "hdp",
+    "dem parti",
+    "iyi parti",
+    "zafer partisi",
+    "yeniden refah*",
+    "erdogan*",
+    "kilicdaroglu*",
+    "imamoglu*",
+    "bahceli*",
+    "aksener*",
+    "demirtas*",
+    "ogan*",
+    "ince muharrem",
+    "muharrem ince",
+    # Terör örgütleri
+    "pkk*",
+    "pyd*",
+    "ypg*",
+    "isid*",
+    "isis",
+    "deas*",
+    "feto*",
+    "el kaide*",
+    "dhkp*",
+    "hizbullah*",
+    "ibda*",
+]
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Bounded, thread-safe least-recently-used mapping."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class ReadThroughCache(Generic[K, V]):
+    """In-memory LRU in front of a persistent store, with single-flight generation.
+
+    Lookups go memory -> ``load`` (the database) -> ``generate``. Concurrent
+    callers missing on the same key await one shared generation instead of
+    each producing their own value.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.memory: LRUCache[K, V] = LRUCache(maxsize)
+        self.stats = CacheStats()
+        self._in_flight: dict[K, asyncio.Future[V]] = {}
+
+    async def get_or_generate(
+        self,
+        key: K,
+        load: Callable[[], Optional[V]],
+        generate: Callable[[], Awaitable[V]],
+    ) -> tuple[V, bool]:
+        """Return ``(value, generated)``; ``generated`` is True only for the caller that produced it."""
+        while True:
+            value = self.memory.get(key)
+            if value is not None:
+                self.stats.memory_hits += 1
+                return value, False
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            self.stats.coalesced += 1
+            try:
+                return await asyncio.shield(pending), False
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The generating caller was cancelled, not us: try again, possibly as the generator.
+
+        future: asyncio.Future[V] = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = load()
+            generated = value is None
+            if generated:
+                self.stats.misses += 1
+                value = await generate()
+            else:
+                self.stats.db_hits += 1
+            self.memory.put(key, value)
+            future.set_result(value)
+            return value, generated
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting on it.
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    def lookup(self, key: K, load: Callable[[], Optional[V]]) -> Optional[V]:
+        """Return a stored value without generating one; values found by ``load`` are cached.
+
+        Hits are counted like ``get_or_generate``'s; a miss is left for the
+        ``get_or_generate`` call that follows to count.
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.memory_hits += 1
+            return value
+        value = load()
+        if value is not None:
+            self.stats.db_hits += 1
+            self.memory.put(key, value)
+        return value
+
+    def invalidate(self, key: K) -> None:
+        self.memory.pop(key)
+
+    def snapshot(self) -> dict:
+        return {**self.stats.as_dict(), "size": len(self.memory), "in_flight": len(self._in_flight)}
@@ -1,11 +1,36 @@
 from __future__ import annotations
 
-from sqlmodel import select
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional, Sequence
 
-from ..database import get_session
-from ..models import Combination, Element
-from ..schemas import CombineResponse, ElementSummary
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
+
+from ..config import get_settings
+from ..database import chunked_rows, get_session, writer
+from ..models import Combination, Element, ModerationVerdict
+from ..schemas import CombineResponse, ElementSummary, GeminiElementResponse
 from . import gemini
+from .batcher import batcher
+from .cache import ReadThroughCache
+from .limits import RATE_LIMIT_MESSAGE, RateLimitExceeded, SessionRateLimiter, address_limiter, admission, rate_limiter
+from .metrics import metrics
+from .moderation import SAFE_FALLBACK, moderation_key, moderator
+from .precompute import precompute_worker
+from .recipes import recipe_graph
+from .search import element_index
+from .sessions import session_store
+from .stats import stats_aggregator
+
+settings = get_settings()
+
+combination_cache: ReadThroughCache[str, ElementSummary] = ReadThroughCache(
+    settings.combination_cache_size
+)
+
+# Streaming generations outlive the request that started them.
+_background: set[asyncio.Task] = set()
 
 
 def normalize_name(name: str) -> str:
@@ -16,25 +41,332 @@ def make_order_key(a_id: int, b_id: int) -> str:
     return "::".join(str(part) for part in sorted([a_id, b_id]))
 
 
-async def combine_elements(element_a: Element, element_b: Element) -> CombineResponse:
-    with get_session() as db:
+async def combine_elements(
+    element_a_ref: str,
+    element_b_ref: str,
+    session_id: Optional[str] = None,
+    client_address: Optional[str] = None,
+) -> CombineResponse:
+    """Combine two elements; pairs that need Gemini are charged to the caller when ``client_address`` is given."""
+    element_a, element_b = _resolve_pair(element_a_ref, element_b_ref)
+    order_key = make_order_key(element_a.id, element_b.id)
+    stored = combination_cache.lookup(order_key, lambda: _load_combination(order_key))
+    if stored is not None:
+        return _respond(element_a, element_b, session_id, stored, created=False)
+    charged = _charge(session_id, client_address)
+    return await _combine(element_a, element_b, session_id, batcher.generate, charged)
+
+
+async def combine_elements_stream(
+    element_a_ref: str,
+    element_b_ref: str,
+    session_id: Optional[str] = None,
+    client_address: Optional[str] = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """Like ``combine_elements``, as ``(event, data)`` pairs.
+
+    Stored pairs produce a single ``result`` event. New pairs are generated
+    with a streaming model call and first produce an ``emoji`` event and,
+    if moderation allows showing it before it is stored, a ``name`` event.
+    Generation failures end the stream with an ``error`` event; rate limit
+    and overload errors are raised before the first event.
+    """
+    element_a, element_b = _resolve_pair(element_a_ref, element_b_ref)
+    order_key = make_order_key(element_a.id, element_b.id)
+    stored = combination_cache.lookup(order_key, lambda: _load_combination(order_key))
+    if stored is not None:
+        yield "result", _respond(element_a, element_b, session_id, stored, created=False).model_dump()
+        return
+    charged = _charge(session_id, client_address)
+
+    partial: asyncio.Queue[Optional[tuple[str, dict]]] = asyncio.Queue()
+
+    async def stream(first: Element, second: Element) -> GeminiElementResponse:
+        async for emoji, name in gemini.stream_gemini(first, second):
+            if name is None:
+                partial.put_nowait(("emoji", {"emoji": emoji}))
+            else:
+                if moderator.servable(name):
+                    partial.put_nowait(("name", {"name_tr": name, "emoji": emoji}))
+                return GeminiElementResponse(name=name, emoji=emoji)
+        raise gemini.GeminiError("Empty Gemini stream")
+
+    # Generation runs as its own task so it completes and is stored even if
+    # the client disconnects; concurrent requests for the pair share it.
+    # A stream cannot be batched, so it takes a whole batch's admission slots.
+    task = asyncio.get_running_loop().create_task(
+        _combine(element_a, element_b, session_id, stream, charged, cost=settings.gemini_batch_max_size)
+    )
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    task.add_done_callback(lambda _: partial.put_nowait(None))
+    while (event := await partial.get()) is not None:
+        yield event
+    try:
+        response = task.result()
+    except ValueError as exc:
+        yield "error", {"detail": str(exc)}
+        return
+    yield "result", response.model_dump()
+
+
+async def _combine(
+    element_a: Element,
+    element_b: Element,
+    session_id: Optional[str],
+    produce: Callable[[Element, Element], Awaitable[GeminiElementResponse]],
+    charged: Sequence[tuple[SessionRateLimiter, str]] = (),
+    cost: int = 1,
+) -> CombineResponse:
+    order_key = make_order_key(element_a.id, element_b.id)
+    called = False
+
+    async def generate() -> ElementSummary:
+        nonlocal called
+        async with admission.admit(cost):
+            called = True
+            try:
+                candidate = await produce(element_a, element_b)
+            except gemini.CircuitOpenError:
+                # Rejected before anything was sent.
+                called = False
+                raise
+        return await _store_combination(element_a, element_b, order_key, candidate)
+
+    try:
+        summary, created = await combination_cache.get_or_generate(
+            order_key,
+            lambda: _load_combination(order_key),
+            generate,
+        )
+    except gemini.CircuitOpenError:
+        # Gemini keeps failing: answer with the fallback element, but do not
+        # record it as this pair's result so the pair is retried later.
+        summary = await _fallback_summary()
+        return CombineResponse(
+            element=summary,
+            created=False,
+            isNewElementForSession=_discover(session_id, summary.id),
+        )
+    except gemini.GeminiError as exc:
+        raise ValueError("Gemini isteği başarısız oldu") from exc
+    finally:
+        # Coalesced, stored meanwhile, shed or short-circuited: this request made no call.
+        if not called:
+            _refund(charged)
+    return _respond(element_a, element_b, session_id, summary, created)
+
+
+def _respond(
+    element_a: Element, element_b: Element, session_id: Optional[str], summary: ElementSummary, created: bool
+) -> CombineResponse:
+    precompute_worker.observe(element_a.id, element_b.id, summary.id)
+    stats_aggregator.record(element_a.id, element_b.id, summary.id)
+    return CombineResponse(
+        element=summary,
+        created=created,
+        isNewElementForSession=_discover(session_id, summary.id),
+    )
+
+
+def _charge(session_id: Optional[str], client_address: Optional[str]) -> list[tuple[SessionRateLimiter, str]]:
+    """Take one Gemini call from the session's budget and from the address's; returns the buckets charged.
+
+    Clients without a session use a per-address bucket in place of the
+    session one. When the address budget is enabled it is charged on every
+    call, because session ids are chosen by clients and a new one must not
+    mean a new budget.
+    """
+    if client_address is None:
+        return []
+    buckets = [(rate_limiter, f"session:{session_id}" if session_id else f"ip:{client_address}")]
+    if address_limiter.enabled:
+        buckets.append((address_limiter, f"address:{client_address}"))
+    charged: list[tuple[SessionRateLimiter, str]] = []
+    for limiter, key in buckets:
+        if not limiter.try_acquire(key):
+            _refund(charged)
+            raise RateLimitExceeded(RATE_LIMIT_MESSAGE)
+        charged.append((limiter, key))
+    return charged
+
+
+def _refund(charged: Sequence[tuple[SessionRateLimiter, str]]) -> None:
+    for limiter, key in charged:
+        limiter.refund(key)
+
+
+def _resolve_pair(element_a_ref: str, element_b_ref: str) -> tuple[Element, Element]:
+    with metrics.timer("db_lookup"), get_session() as db:
+        element_a = _resolve_element(db, element_a_ref)
+        element_b = _resolve_element(db, element_b_ref)
         if not element_a or not element_b:
             raise ValueError("Element not found")
+        db.expunge_all()
+    return element_a, element_b
+
+
+def _discover(session_id: Optional[str], element_id: int) -> bool:
+    return session_store.add(session_id, element_id) if session_id else False
+
+
+async def precompute_pair(element_a_id: int, element_b_id: int) -> Optional[int]:
+    """Generate and store a pair ahead of time; returns the result id if Gemini was called."""
+    with get_session() as db:
+        element_a = db.get(Element, element_a_id)
+        element_b = db.get(Element, element_b_id)
+        if not element_a or not element_b:
+            return None
+        db.expunge_all()
+
+    order_key = make_order_key(element_a.id, element_b.id)
+
+    async def generate() -> ElementSummary:
+        # Bypasses the batcher so background work never joins an interactive batch.
+        candidate = await gemini.call_gemini(element_a, element_b)
+        return await _store_combination(element_a, element_b, order_key, candidate)
+
+    summary, generated = await combination_cache.get_or_generate(
+        order_key,
+        lambda: _load_combination(order_key),
+        generate,
+    )
+    return summary.id if generated else None
+
+
+def _resolve_element(db, ref: str) -> Optional[Element]:
+    """Find an element by id, by name, or by an emoji-prefixed name."""
+    ref = ref.strip()
+    if ref.isdigit():
+        return db.get(Element, int(ref))
+    stripped = ref
+    while stripped and not stripped[0].isalnum():
+        stripped = stripped[1:]
+    for candidate in dict.fromkeys((ref, stripped)):
+        element = db.exec(
+            select(Element).where(Element.normalized_name == normalize_name(candidate))
+        ).one_or_none()
+        if element:
+            return element
+    return None
+
+
+def _load_combination(order_key: str) -> Optional[ElementSummary]:
+    with metrics.timer("db_lookup"), get_session() as db:
+        element = db.exec(
+            select(Element)
+            .join(Combination, Combination.result_element_id == Element.id)
+            .where(Combination.order_key == order_key)
+        ).one_or_none()
+        return _to_summary(element) if element else None
+
+
+async def _store_combination(
+    element_a: Element,
+    element_b: Element,
+    order_key: str,
+    candidate: GeminiElementResponse,
+) -> ElementSummary:
+    with metrics.timer("moderation"):
+        reviewed = await moderator.review(candidate)
+
+    def write(db: Session) -> tuple[Element, Combination]:
+        result = upsert_elements(db, [(reviewed.name, reviewed.emoji)])[normalize_name(reviewed.name)]
+        combination = Combination(
+            element_a_id=element_a.id,
+            element_b_id=element_b.id,
+            result_element_id=result.id,
+            order_key=order_key,
+        )
+        db.add(combination)
+        return result, combination
+
+    try:
+        with metrics.timer("db_write"):
+            result, combination = await writer.submit(write)
+    except IntegrityError:
+        # Another process stored this pair first.
+        stored = _load_combination(order_key)
+        if stored is None:
+            raise
+        return stored
+    element_index.add(result)
+    recipe_graph.add(combination.id, element_a.id, element_b.id, result.id)
+    if reviewed is candidate:
+        moderator.check_later(candidate.name, retract_element)
+    return _to_summary(result)
+
+
+async def retract_element(name: str) -> None:
+    """Point every combination producing ``name`` at the safe fallback and hide it from the catalog."""
+    key = moderation_key(name)
+
+    def write(db: Session) -> Optional[tuple[Element, int, list[str]]]:
+        replacement = upsert_elements(db, [(SAFE_FALLBACK.name, SAFE_FALLBACK.emoji)])[
+            normalize_name(SAFE_FALLBACK.name)
+        ]
+        element = db.exec(select(Element).where(Element.normalized_name == normalize_name(name))).one_or_none()
+        if element is None or element.is_seed or element.id == replacement.id:
+            return None
+        combinations = db.exec(select(Combination).where(Combination.result_element_id == element.id)).all()
+        for combination in combinations:
+            combination.result_element_id = replacement.id
+            db.add(combination)
+        db.exec(update(ModerationVerdict).where(ModerationVerdict.key == key).values(element_id=element.id))
+        return replacement, element.id, [combination.order_key for combination in combinations]
+
+    retracted = await writer.submit(write)
+    if retracted is None:
+        return
+    replacement, element_id, order_keys = retracted
+    element_index.add(replacement)
+    element_index.remove(element_id)
+    recipe_graph.redirect(element_id, replacement.id)
+    for order_key in order_keys:
+        combination_cache.invalidate(order_key)
+
+
+async def _fallback_summary() -> ElementSummary:
+    fallback = gemini.FALLBACK_ELEMENT
+    element = await writer.submit(
+        lambda db: upsert_elements(db, [(fallback.name, fallback.emoji)])[normalize_name(fallback.name)]
+    )
+    element_index.add(element)
+    return _to_summary(element)
 
-        result_element = None
 
-        try:
-            result_element = await gemini.call_gemini(element_a, element_b)
-        except gemini.GeminiError as exc:
-            raise ValueError("Gemini isteği başarısız oldu") from exc
+def upsert_elements(
+    db: Session,
+    items: Iterable[tuple[str, str]],
+    is_seed: bool = False,
+) -> dict[str, Element]:
+    """Insert ``(name, emoji)`` items that do not exist yet, keyed on ``normalized_name``.
 
-        return CombineResponse(element=_to_summary(result_element), created=True)
+    Runs one ``INSERT .. ON CONFLICT DO NOTHING`` and one ``SELECT`` per
+    chunk, and returns every requested element by normalized name, whether
+    it was just inserted or already there.
+    """
+    rows = {}
+    for name, emoji in items:
+        normalized = normalize_name(name)
+        rows.setdefault(
+            normalized,
+            {"name": name, "normalized_name": normalized, "emoji": emoji, "is_seed": is_seed},
+        )
+    values = list(rows.values())
+    elements: dict[str, Element] = {}
+    for chunk in chunked_rows(values):
+        db.exec(sqlite_insert(Element).values(chunk).on_conflict_do_nothing())
+        names = [row["normalized_name"] for row in chunk]
+        for element in db.exec(select(Element).where(Element.normalized_name.in_(names))):
+            elements[element.normalized_name] = element
+    return elements
 
 
 def _to_summary(element: Element) -> ElementSummary:
     return ElementSummary(
         id=element.id,
-        name=element.name,
+        name_tr=element.name,
         emoji=element.emoji,
         is_seed=element.is_seed,
     )
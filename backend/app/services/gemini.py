@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import Optional
-
-from google import genai
+import random
+import re
+import time
+from typing import AsyncIterator, Optional
 
 import httpx
 
@@ -11,36 +14,312 @@ from ..config import get_settings
 from ..models import Element
 from ..schemas import GeminiElementResponse
 from .examples import EXAMPLE_COMBINATIONS
+from .metrics import metrics
+from .text import search_key
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+FALLBACK_ELEMENT = GeminiElementResponse(name="Bilinmeyen Şey", emoji="❓")
+
+_NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*[.):-]\s*(.+)$")
+
+# The prompts ask for names of one to three words.
+MAX_NAME_WORDS = 3
+
 
 class GeminiError(Exception):
     """Raised when Gemini request fails."""
 
 
-async def call_gemini(element_a: Element, element_b: Element) -> GeminiElementResponse:
-    if not settings.gemini_api_key:
-        raise GeminiError("Gemini API key is absent!")
+class CircuitOpenError(GeminiError):
+    """Raised without calling Gemini while the circuit breaker is open."""
 
-    client = genai.Client()  # Automatically picks up API key from environment
-    
-    prompt = build_prompt(element_a, element_b)
-    response = client.models.generate_content(
-        model=settings.gemini_model,
-        contents=prompt
-    )
 
-    logger.debug("Received Gemini response: %s", response)
+class _TransientError(Exception):
+    """A failure worth retrying; becomes a ``GeminiError`` once retries run out."""
+
+
+class CircuitBreaker:
+    """Stops outbound calls after repeated failures, then lets one trial call through."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Forget an abandoned trial call without counting it either way."""
+        self._trial_in_flight = False
+
+
+class GeminiClient:
+    """Long-lived async client for the Gemini ``generateContent`` REST endpoint.
+
+    Connections are pooled, concurrent calls are capped by a semaphore, each
+    call has an overall deadline, transient failures are retried with
+    jittered exponential backoff and a circuit breaker short-circuits calls
+    while the upstream keeps failing.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key: Optional[str],
+        model: str,
+        endpoint: str,
+        stream_endpoint: str,
+        timeout_seconds: float,
+        max_concurrency: int,
+        max_retries: int,
+        retry_backoff_seconds: float,
+        breaker: CircuitBreaker,
+    ) -> None:
+        self.api_key = api_key
+        self.model = model
+        self.endpoint = endpoint
+        self.stream_endpoint = stream_endpoint
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http: Optional[httpx.AsyncClient] = None
+        # Calls admitted to generate_text, whether running or waiting for a slot.
+        self.in_flight = 0
+
+    @classmethod
+    def from_settings(cls) -> "GeminiClient":
+        return cls(
+            api_key=settings.gemini_api_key,
+            model=settings.gemini_model,
+            endpoint=settings.gemini_endpoint,
+            stream_endpoint=settings.gemini_stream_endpoint,
+            timeout_seconds=settings.gemini_timeout_seconds,
+            max_concurrency=settings.gemini_max_concurrency,
+            max_retries=settings.gemini_max_retries,
+            retry_backoff_seconds=settings.gemini_retry_backoff_seconds,
+            breaker=CircuitBreaker(
+                settings.gemini_breaker_failure_threshold,
+                settings.gemini_breaker_reset_seconds,
+            ),
+        )
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                headers={"x-goog-api-key": self.api_key or ""},
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def generate_text(self, prompt: str) -> str:
+        if not self.api_key:
+            raise GeminiError("Gemini API key is absent!")
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        queued = time.perf_counter()
+        started: Optional[float] = None
+        try:
+            async with self._semaphore:
+                # The timer and the deadline start once a slot is free: waiting
+                # behind local calls is its own stage and says nothing about
+                # the upstream's health.
+                started = time.perf_counter()
+                metrics.observe("model_queue", started - queued)
+                deadline = loop.time() + self.timeout_seconds
+                data = await asyncio.wait_for(
+                    self._post_with_retries(prompt, deadline), timeout=self.timeout_seconds
+                )
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except asyncio.TimeoutError as exc:
+            self.breaker.record_failure()
+            raise GeminiError("Gemini request deadline exceeded") from exc
+        except _TransientError as exc:
+            self.breaker.record_failure()
+            raise GeminiError(str(exc)) from exc
+        except GeminiError:
+            # The upstream answered; the request itself was bad.
+            self.breaker.record_success()
+            raise
+        except Exception as exc:  # noqa: BLE001
+            # Anything unforeseen still has to settle the breaker, or a failed
+            # trial call would leave it half-open for good.
+            self.breaker.record_failure()
+            raise GeminiError(f"Gemini call failed: {exc!r}") from exc
+        finally:
+            self.in_flight -= 1
+            if started is not None:
+                metrics.observe("model_call", time.perf_counter() - started)
+        self.breaker.record_success()
+
+        logger.debug("Received Gemini response: %s", data)
+        text = _extract_text_from_response(data)
+        if not text:
+            raise GeminiError("No text in Gemini response")
+        return text
+
+    async def stream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Yield text chunks from ``streamGenerateContent`` as they arrive.
+
+        Not retried: a retry after partial output would repeat it. Closing
+        the iterator early ends the upstream request.
+        """
+        if not self.api_key:
+            raise GeminiError("Gemini API key is absent!")
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+
+        url = self.stream_endpoint.format(model=self.model)
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        queued = time.perf_counter()
+        started: Optional[float] = None
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                metrics.observe("model_queue", started - queued)
+                deadline = loop.time() + self.timeout_seconds
+                async with self.http.stream("POST", url, json=body, timeout=self.timeout_seconds) as response:
+                    if response.status_code >= 400:
+                        if response.status_code in RETRYABLE_STATUS_CODES:
+                            raise _TransientError(f"Gemini returned HTTP {response.status_code}")
+                        raise GeminiError(f"Gemini returned HTTP {response.status_code}")
+                    async for line in response.aiter_lines():
+                        if loop.time() > deadline:
+                            raise _TransientError("Gemini request deadline exceeded")
+                        if not line.startswith("data:"):
+                            continue
+                        text = _response_text(json.loads(line[5:]))
+                        if text:
+                            yield text
+        except GeneratorExit:
+            # The caller stopped reading once it had what it needed.
+            self.breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except GeminiError:
+            self.breaker.record_success()
+            raise
+        except Exception as exc:  # noqa: BLE001
+            # Transport errors, bad chunks and anything unforeseen.
+            self.breaker.record_failure()
+            raise GeminiError(f"Gemini stream failed: {exc!r}") from exc
+        else:
+            self.breaker.record_success()
+        finally:
+            self.in_flight -= 1
+            if started is not None:
+                metrics.observe("model_call", time.perf_counter() - started)
+
+    async def _post_with_retries(self, prompt: str, deadline: float) -> dict:
+        url = self.endpoint.format(model=self.model)
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.post(
+                    url, json=body, timeout=max(deadline - loop.time(), 0.001)
+                )
+            except httpx.HTTPError as exc:
+                error: Exception = _TransientError(f"Gemini transport error: {exc!r}")
+            else:
+                if response.status_code < 400:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        error = _TransientError("Gemini returned a body that is not JSON")
+                elif response.status_code in RETRYABLE_STATUS_CODES:
+                    error = _TransientError(f"Gemini returned HTTP {response.status_code}")
+                else:
+                    raise GeminiError(f"Gemini returned HTTP {response.status_code}")
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+            delay = random.uniform(0, self.retry_backoff_seconds * 2 ** (attempt - 1))
+            if loop.time() + delay >= deadline:
+                raise error
+            logger.info("Retrying Gemini call in %.2fs after: %s", delay, error)
+            await asyncio.sleep(delay)
+
+
+_client: Optional[GeminiClient] = None
+
+
+def get_client() -> GeminiClient:
+    global _client
+    if _client is None:
+        _client = GeminiClient.from_settings()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
-    text = _extract_text_from_response(response)
+async def call_gemini(element_a: Element, element_b: Element) -> GeminiElementResponse:
+    prompt = build_prompt(element_a, element_b)
+    text = await get_client().generate_text(prompt)
     logger.debug("Extracted text from Gemini response: %s", text)
-    if not text:
-        raise GeminiError("No text in Gemini response")
 
     try:
-        parsed = _parse_candidate_response(text)
+        with metrics.timer("parse"):
+            parsed = _parse_candidate_response(text)
         logger.debug("Parsed Gemini response: %s", parsed)
     except ValueError as exc:
         logger.warning("Failed to parse Gemini response: %s", exc)
@@ -49,7 +328,42 @@ async def call_gemini(element_a: Element, element_b: Element) -> GeminiElementRe
     return parsed
 
 
+async def stream_gemini(element_a: Element, element_b: Element) -> AsyncIterator[tuple[str, Optional[str]]]:
+    """Yield ``(emoji, None)`` as soon as the emoji arrives, then ``(emoji, name)`` once the first line is complete.
+
+    Only the first line is used (see ``_parse_candidate_response``), so the
+    stream is closed as soon as it is complete.
+    """
+    text = ""
+    emoji_sent = False
+    chunks = get_client().stream_text(build_prompt(element_a, element_b))
+    try:
+        async for chunk in chunks:
+            text += chunk
+            started = text.lstrip()
+            if started and not emoji_sent:
+                emoji_sent = True
+                yield started[0], None
+            if "\n" in started:
+                break
+    finally:
+        await chunks.aclose()
+
+    try:
+        with metrics.timer("parse"):
+            parsed = _parse_candidate_response(text)
+    except ValueError as exc:
+        logger.warning("Failed to parse streamed Gemini response: %s", exc)
+        raise GeminiError("Invalid Gemini response format") from exc
+    yield parsed.emoji, parsed.name
+
+
 def _extract_text_from_response(data: dict) -> Optional[str]:
+    text = _response_text(data)
+    return text.strip() if text is not None else None
+
+
+def _response_text(data: dict) -> Optional[str]:
     try:
         candidates = data.get("candidates", [])
         if not candidates:
@@ -58,7 +372,7 @@ def _extract_text_from_response(data: dict) -> Optional[str]:
         parts = content.get("parts", [])
         for part in parts:
             if "text" in part:
-                return part["text"].strip()
+                return part["text"]
         return None
     except Exception:  # noqa: BLE001
         return None
@@ -78,14 +392,101 @@ def _parse_candidate_response(raw_text: str) -> GeminiElementResponse:
     name = first_line[1:].strip()
     if not name:
         raise ValueError("Missing name after emoji")
-    return GeminiElementResponse(name_tr=name, emoji=emoji)
+    return GeminiElementResponse(name=name, emoji=emoji)
 
 
-def build_prompt(element_a: Element, element_b: Element) -> str:
-    example_lines = "\n".join(
-        f"{a} + {b} -> {c}" for a, b, c in EXAMPLE_COMBINATIONS
+def parse_batch_response(raw_text: str, count: int) -> list[Optional[GeminiElementResponse]]:
+    """Split a numbered multi-pair answer into per-pair candidates.
+
+    Echoed pair lines keep only the text after their last ``->``. Pairs whose
+    line is missing, malformed or longer than the prompt allows come back as
+    ``None`` so the caller can retry them one by one.
+    """
+    results: list[Optional[GeminiElementResponse]] = [None] * count
+    for line in raw_text.splitlines():
+        match = _NUMBERED_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if not 0 <= index < count or results[index] is not None:
+            continue
+        answer = match.group(2).rpartition("->")[2]
+        if "+ (" in answer:
+            continue
+        try:
+            candidate = _parse_candidate_response(answer)
+        except ValueError:
+            continue
+        if len(candidate.name.split()) <= MAX_NAME_WORDS:
+            results[index] = candidate
+    return results
+
+
+def parse_moderation_response(raw_text: str, count: int) -> list[Optional[tuple[bool, str]]]:
+    """Split a numbered moderation answer into ``(is_safe, reason)`` labels.
+
+    Names whose line is missing or carries neither label come back as ``None``.
+    """
+    results: list[Optional[tuple[bool, str]]] = [None] * count
+    for line in raw_text.splitlines():
+        match = _NUMBERED_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if not 0 <= index < count or results[index] is not None:
+            continue
+        label, _, reason = match.group(2).partition(":")
+        label = search_key(label.strip("*` "))
+        if label.startswith("güvenli"):
+            results[index] = (True, "")
+        elif label.startswith("sakincali"):
+            results[index] = (False, reason.strip())
+    return results
+
+
+def build_moderation_prompt(names: list[str]) -> str:
+    name_lines = "\n".join(f"{number}. {name}" for number, name in enumerate(names, start=1))
+    return (
+        "Bir kelime üretme oyununda oyunculara gösterilecek öğe isimlerini denetliyorsun.\n"
+        "Hakaret, küfür, cinsel içerik, siyasi parti veya aday propagandası, terör örgütü ya da nefret söylemi içerenler sakıncalıdır.\n"
+        "Her satır için tek satır oluştur: aynı numara, nokta ve GÜVENLİ ya da SAKINCALI. "
+        "SAKINCALI ise iki noktadan sonra kısa sebebini yaz.\n"
+        "Örnek:\n1. GÜVENLİ\n2. SAKINCALI: hakaret\n\n"
+        "Denetlenecek isimler:\n"
+        f"{name_lines}"
+    )
+
+
+def _format_pair(element_a: Element, element_b: Element) -> str:
+    return (
+        f"{(element_a.emoji or '❓')} (\"{element_a.name}\") + "
+        f"{(element_b.emoji or '❓')} (\"{element_b.name}\") ->"
+    )
+
+
+def _example_lines() -> str:
+    return "\n".join(f"{a} + {b} -> {c}" for a, b, c in EXAMPLE_COMBINATIONS)
+
+
+def build_batch_prompt(pairs: list[tuple[Element, Element]]) -> str:
+    pair_lines = "\n".join(
+        f"{number}. {_format_pair(a, b)}" for number, (a, b) in enumerate(pairs, start=1)
     )
 
+    return (
+        "Görevin türk internet ve genel kültürünü temel alan kelime üretme oyununda mantıklı, tutarlı ve mümkün olduğunda komik üretimler yapmak.\n"
+        "Numaralı her satırdaki iki elementten yeni bir element üreteceksin.\n"
+        "Her satır için tek satır oluştur: aynı numara, nokta, bir emoji ve hemen ardından element ismi.\n"
+        "En az 1, en fazla 3 kelimelik elementler üret.\n"
+        "Bazı güzel girdi ve çıktı örnekleri. Bunları taklit etme, kreatif davran. Özgün ol. Komik üret.\n"
+        "Örnekler:\n"
+        f"{_example_lines()}\n\n"
+        "Şimdi bunlardan yeni elementler üret:\n"
+        f"{pair_lines}"
+    )
+
+
+def build_prompt(element_a: Element, element_b: Element) -> str:
     return (
         "Görevin türk internet ve genel kültürünü temel alan kelime üretme oyununda mantıklı, tutarlı ve mümkün olduğunda komik üretimler yapmak.\n"
         "Sana verilen iki elementten yeni bir element üreteceksin.\n"
@@ -93,8 +494,7 @@ def build_prompt(element_a: Element, element_b: Element) -> str:
         "En az 1, en fazla 3 kelimelik elementler üret.\n"
         "Bazı güzel girdi ve çıktı örnekleri. Bunları taklit etme, kreatif davran. Özgün ol. Komik üret.\n"
         "Örnekler:\n"
-        f"{example_lines}\n\n"
+        f"{_example_lines()}\n\n"
         "Şimdi bunlardan yeni bir element üret:\n"
-        f"{(element_a.emoji or '❓')} (\"{element_a.name_tr}\") + "
-        f"{(element_b.emoji or '❓')} (\"{element_b.name_tr}\") ->"
+        f"{_format_pair(element_a, element_b)}"
     )
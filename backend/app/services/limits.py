@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, delete
+
+from ..config import get_settings
+from ..database import chunked_rows, get_session, writer
+from ..models import RateLimitBucket
+from .periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+RATE_LIMIT_MESSAGE = "Bugün çok üretken çıktın! Biraz dinlen, sonra devam edelim."
+OVERLOADED_MESSAGE = "Şu an çok yoğunuz, birazdan tekrar dene."
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a session has used up its Gemini calls."""
+
+
+class OverloadedError(Exception):
+    """Raised when a cache miss is shed because the outbound budget is full."""
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_at: float
+    dirty: bool = False
+
+
+class _Shard:
+    def __init__(self) -> None:
+        self.buckets: OrderedDict[str, _Bucket] = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class SessionRateLimiter:
+    """Token bucket per key: ``capacity`` calls, refilled evenly over ``period_seconds``.
+
+    Keys are hashed onto shards, each an LRU dict with its own lock, so a
+    check is O(1) and never contends with unrelated keys. A bucket that has
+    refilled completely is the same as a new one and is dropped; shards over
+    their size evict the least recently used buckets. Changed buckets are
+    checkpointed to SQLite periodically and loaded back on first use. A
+    capacity of 0 disables the limiter.
+    """
+
+    def __init__(self, capacity: int, period_seconds: float, shards: int, max_buckets: int) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period_seconds
+        self.max_per_shard = max(1, max_buckets // shards)
+        self._shards = [_Shard() for _ in range(shards)]
+        self._unsaved: dict[str, tuple[float, float]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._checkpointer = PeriodicTask(
+            "rate limit checkpoint", settings.rate_limit_checkpoint_seconds, self.checkpoint
+        )
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def try_acquire(self, key: str, now: Optional[float] = None) -> bool:
+        """Take one token; returns False if the bucket is empty."""
+        shard = self._shard(key)
+        with shard.lock:
+            bucket = self._refilled(shard, key, now if now is not None else time.time())
+            if bucket.tokens < 1:
+                return False
+            bucket.tokens -= 1
+            bucket.dirty = True
+            return True
+
+    def refund(self, key: str) -> None:
+        """Give back a token taken for a call that did not happen."""
+        shard = self._shard(key)
+        with shard.lock:
+            bucket = self._refilled(shard, key, time.time())
+            bucket.tokens = min(self.capacity, bucket.tokens + 1)
+            bucket.dirty = True
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def _refilled(self, shard: _Shard, key: str, now: float) -> _Bucket:
+        bucket = shard.buckets.get(key)
+        if bucket is None:
+            bucket = self._load(key, now)
+            shard.buckets[key] = bucket
+            self._evict(shard)
+        else:
+            shard.buckets.move_to_end(key)
+        if now > bucket.updated_at:
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated_at) * self.rate)
+            bucket.updated_at = now
+        return bucket
+
+    def _load(self, key: str, now: float) -> _Bucket:
+        saved = self._unsaved.get(key)
+        if saved is None:
+            with get_session() as db:
+                row = db.get(RateLimitBucket, key)
+            saved = (row.tokens, row.updated_at) if row else None
+        if saved is None:
+            return _Bucket(tokens=self.capacity, updated_at=now)
+        return _Bucket(tokens=saved[0], updated_at=saved[1])
+
+    def _evict(self, shard: _Shard) -> None:
+        while len(shard.buckets) > self.max_per_shard:
+            key, bucket = shard.buckets.popitem(last=False)
+            if bucket.dirty:
+                self._unsaved[key] = (bucket.tokens, bucket.updated_at)
+
+    def checkpoint(self, now: Optional[float] = None) -> None:
+        """Queue changed buckets for saving and drop the ones that refilled."""
+        if not self.enabled:
+            return
+        now = now if now is not None else time.time()
+        changed = dict(self._unsaved)
+        for shard in self._shards:
+            with shard.lock:
+                for key in list(shard.buckets):
+                    bucket = shard.buckets[key]
+                    full = bucket.tokens + (now - bucket.updated_at) * self.rate >= self.capacity
+                    if bucket.dirty:
+                        changed[key] = (bucket.tokens, bucket.updated_at)
+                        bucket.dirty = False
+                    if full:
+                        # Reloading the saved state refills at least as far.
+                        del shard.buckets[key]
+        self._unsaved.update(changed)
+        horizon = now - self.capacity / self.rate
+        task = asyncio.get_running_loop().create_task(self._save(changed, horizon))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _save(self, buckets: dict[str, tuple[float, float]], horizon: float) -> None:
+        try:
+            await writer.submit(lambda db: _save_rows(db, buckets, horizon))
+        except Exception:  # noqa: BLE001
+            logger.exception("Saving %d rate limit buckets failed", len(buckets))
+            return
+        for key, state in buckets.items():
+            if self._unsaved.get(key) is state:
+                del self._unsaved[key]
+
+    def start(self) -> None:
+        if self.enabled:
+            self._checkpointer.start()
+
+    async def stop(self) -> None:
+        await self._checkpointer.stop()
+        self.checkpoint()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+
+def _save_rows(db: Session, buckets: dict[str, tuple[float, float]], horizon: float) -> None:
+    rows = [{"key": key, "tokens": tokens, "updated_at": updated_at} for key, (tokens, updated_at) in buckets.items()]
+    for chunk in chunked_rows(rows):
+        statement = sqlite_insert(RateLimitBucket).values(chunk)
+        db.exec(
+            statement.on_conflict_do_update(
+                index_elements=["key"],
+                set_={"tokens": statement.excluded.tokens, "updated_at": statement.excluded.updated_at},
+            )
+        )
+    # Rows untouched for a whole period describe full buckets.
+    db.exec(delete(RateLimitBucket).where(RateLimitBucket.updated_at < horizon))
+
+
+class AdmissionController:
+    """Caps the cache-miss generations in flight to what Gemini can take at once.
+
+    Capacity is counted in batch slots: a miss that goes through the
+    batcher costs one, a call that cannot be batched (a stream) costs a
+    whole batch. Requests that do not fit wait in FIFO order, up to
+    ``max_queue`` of them and at most ``max_wait_seconds``; anything beyond
+    that is shed right away, so overload turns into fast errors instead of
+    growing latency.
+    """
+
+    def __init__(self, capacity: int, max_queue: int, max_wait_seconds: float) -> None:
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.in_use = 0
+        self.shed = 0
+        self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+
+    @asynccontextmanager
+    async def admit(self, cost: int = 1) -> AsyncIterator[None]:
+        cost = min(cost, self.capacity)
+        if self._waiters or self.in_use + cost > self.capacity:
+            await self._wait(cost)
+        else:
+            self.in_use += cost
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+    async def _wait(self, cost: int) -> None:
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise OverloadedError(OVERLOADED_MESSAGE)
+        future = asyncio.get_running_loop().create_future()
+        waiter = (cost, future)
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed += 1
+            raise OverloadedError(OVERLOADED_MESSAGE) from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller was cancelled: hand the slots on.
+                self._release(cost)
+            else:
+                self._discard(waiter)
+            raise
+
+    def _discard(self, waiter: tuple[int, asyncio.Future]) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        # A large request at the head may have been holding smaller ones back.
+        self._grant()
+
+    def _release(self, cost: int) -> None:
+        self.in_use -= cost
+        self._grant()
+
+    def _grant(self) -> None:
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self.in_use + cost > self.capacity:
+                return
+            self._waiters.popleft()
+            self.in_use += cost
+            future.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "waiting": len(self._waiters),
+            "shed": self.shed,
+        }
+
+
+rate_limiter = SessionRateLimiter(
+    capacity=settings.rate_limit_per_day,
+    period_seconds=86400,
+    shards=settings.rate_limit_shards,
+    max_buckets=settings.rate_limit_max_buckets,
+)
+address_limiter = SessionRateLimiter(
+    capacity=settings.rate_limit_per_address_per_day,
+    period_seconds=86400,
+    shards=settings.rate_limit_shards,
+    max_buckets=settings.rate_limit_max_buckets,
+)
+admission = AdmissionController(
+    capacity=settings.admission_capacity or settings.gemini_max_concurrency * settings.gemini_batch_max_size,
+    max_queue=settings.admission_max_queue,
+    max_wait_seconds=settings.admission_max_wait_seconds,
+)
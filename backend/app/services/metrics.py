@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+
+# Upper bounds in seconds, from sub-millisecond lookups to slow model calls.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGES = ("db_lookup", "db_write", "model_queue", "model_call", "parse", "moderation", "serialization")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; recording is a binary search and an increment."""
+
+    def __init__(self, bounds: tuple[float, ...] = BUCKETS) -> None:
+        self.bounds = bounds
+        # One slot per bound plus one for values above the last bound.
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """Per-stage latency histograms for the request path."""
+
+    def __init__(self, stages: tuple[str, ...] = STAGES) -> None:
+        self.stages = {stage: Histogram() for stage in stages}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def render(self, cache: dict) -> str:
+        """Prometheus text exposition of the stage histograms and combination cache counters."""
+        lines = [
+            "# HELP sonsuz_stage_seconds Time spent per request stage.",
+            "# TYPE sonsuz_stage_seconds histogram",
+        ]
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'sonsuz_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'sonsuz_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'sonsuz_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'sonsuz_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines += [
+            "# HELP sonsuz_combination_cache_lookups_total Combination lookups by outcome.",
+            "# TYPE sonsuz_combination_cache_lookups_total counter",
+        ]
+        outcomes = {key: cache.get(key, 0) for key in ("memory_hits", "db_hits", "coalesced", "misses")}
+        for outcome, count in outcomes.items():
+            lines.append(f'sonsuz_combination_cache_lookups_total{{outcome="{outcome}"}} {count}')
+        lookups = sum(outcomes.values())
+        served = outcomes["memory_hits"] + outcomes["db_hits"] + outcomes["coalesced"]
+        lines += [
+            "# HELP sonsuz_combination_cache_hit_ratio Lookups answered without a model call.",
+            "# TYPE sonsuz_combination_cache_hit_ratio gauge",
+            f"sonsuz_combination_cache_hit_ratio {served / lookups if lookups else 0.0:.6f}",
+            "# HELP sonsuz_combination_cache_memory_hit_ratio Lookups answered from memory.",
+            "# TYPE sonsuz_combination_cache_memory_hit_ratio gauge",
+            f"sonsuz_combination_cache_memory_hit_ratio {outcomes['memory_hits'] / lookups if lookups else 0.0:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
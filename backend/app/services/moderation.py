@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+import unicodedata
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from ..config import get_settings
+from ..database import get_session, writer
+from ..models import ModerationVerdict
+from ..schemas import GeminiElementResponse
+from . import gemini
+from .blocklist import BLOCKLIST
+from .cache import LRUCache
+from .text import turkish_lower
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SAFE_FALLBACK = GeminiElementResponse(name="Güvenli Kavram", emoji="🤝")
+
+SERVE_THEN_FLAG = "serve_then_flag"
+BLOCK_UNTIL_VERDICT = "block_until_verdict"
+
+_LEET = str.maketrans(
+    {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s", "!": "i", "€": "e"}
+)
+_SEPARATORS = re.compile(r"[\W_]+")
+_REPEATS = re.compile(r"(.)\1+")
+
+
+def moderation_key(text: str) -> str:
+    """Fold text so spelling tricks map onto one form.
+
+    Turkish lowercase, leet digits and symbols as letters, diacritics
+    stripped (``ş`` -> ``s``, ``ı`` -> ``i``), runs of a letter collapsed and
+    anything else turned into single spaces.
+    """
+    text = unicodedata.normalize("NFKD", turkish_lower(text).translate(_LEET))
+    text = "".join(char for char in text if not unicodedata.combining(char)).replace("ı", "i")
+    return " ".join(_REPEATS.sub(r"\1", _SEPARATORS.sub(" ", text)).split())
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every pattern occurring in a text in one pass."""
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns: list[str] = []
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        for pattern in dict.fromkeys(patterns):
+            if pattern:
+                self._insert(pattern)
+        self._link()
+
+    def _insert(self, pattern: str) -> None:
+        node = 0
+        for char in pattern:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = child
+        self._out[node] += (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def find(self, text: str) -> list[str]:
+        """Patterns found in ``text``, in order of where they end."""
+        found: list[str] = []
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for index in self._out[node]:
+                found.append(self.patterns[index])
+        return found
+
+
+def compile_blocklist(terms: Iterable[str]) -> AhoCorasick:
+    """Build the matcher for ``terms``; each is matched as whole words, or as a word prefix with a trailing ``*``."""
+    patterns = []
+    for term in terms:
+        term = term.strip()
+        if not term or term.startswith("#"):
+            continue
+        prefix = term.endswith("*")
+        key = moderation_key(term.rstrip("*"))
+        if key:
+            patterns.append(f" {key}" if prefix else f" {key} ")
+    return AhoCorasick(patterns)
+
+
+@dataclass(frozen=True)
+class Verdict:
+    safe: bool
+    reason: str = ""
+
+
+@dataclass
+class _PendingName:
+    key: str
+    name: str
+    future: asyncio.Future = field(repr=False)
+
+
+class Moderator:
+    """Blocklist screening plus cached, batched model moderation for generated names.
+
+    Every name is folded with ``moderation_key`` and matched against the
+    compiled blocklist in one pass. Names that pass are checked by Gemini in
+    moderation mode: under ``block_until_verdict`` before they are stored,
+    under ``serve_then_flag`` after they were already served, in which case
+    an unsafe verdict retracts them. Verdicts are cached in memory by key
+    and model verdicts are stored, so a name is only ever sent once.
+    """
+
+    def __init__(self, policy: str, cache_size: int, window_seconds: float, max_size: int) -> None:
+        if policy not in (SERVE_THEN_FLAG, BLOCK_UNTIL_VERDICT):
+            raise ValueError(f"Unknown moderation policy: {policy}")
+        self.policy = policy
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self.verdicts: LRUCache[str, Verdict] = LRUCache(cache_size)
+        self._matcher: Optional[AhoCorasick] = None
+        self._pending: list[_PendingName] = []
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def matcher(self) -> AhoCorasick:
+        if self._matcher is None:
+            terms = list(BLOCKLIST)
+            if settings.moderation_blocklist_path:
+                terms += Path(settings.moderation_blocklist_path).read_text(encoding="utf-8").splitlines()
+            self._matcher = compile_blocklist(terms)
+        return self._matcher
+
+    def screen(self, name: str) -> Optional[Verdict]:
+        """Verdict available without a model call: blocklist hit or cached verdict."""
+        key = moderation_key(name)
+        verdict = self.verdicts.get(key)
+        if verdict is not None:
+            return verdict
+        hits = self.matcher.find(f" {key} ")
+        if hits:
+            verdict = Verdict(safe=False, reason=f"blocklist: {hits[0].strip()}")
+        else:
+            with get_session() as db:
+                row = db.get(ModerationVerdict, key)
+            if row is None:
+                return None
+            verdict = Verdict(safe=row.is_safe, reason=row.reason)
+        self.verdicts.put(key, verdict)
+        return verdict
+
+    def servable(self, name: str) -> bool:
+        """Whether ``name`` may be shown before ``review`` has run, e.g. as partial streamed output."""
+        if not settings.moderation_enabled:
+            return True
+        verdict = self.screen(name)
+        if verdict is None:
+            return self.policy == SERVE_THEN_FLAG or not settings.gemini_api_key
+        return verdict.safe
+
+    async def review(self, candidate: GeminiElementResponse) -> GeminiElementResponse:
+        """Return ``candidate`` or the safe fallback, waiting for the model only if the policy says so."""
+        if not settings.moderation_enabled:
+            return candidate
+        verdict = self.screen(candidate.name)
+        if verdict is None and self.policy == BLOCK_UNTIL_VERDICT and settings.gemini_api_key:
+            verdict = await self.verdict(candidate.name)
+            if verdict is None:
+                # Nothing would retract the name later under this policy: fail closed.
+                logger.info("Replacing %r: no moderation verdict", candidate.name)
+                return SAFE_FALLBACK
+        if verdict is not None and not verdict.safe:
+            logger.info("Replacing %r: %s", candidate.name, verdict.reason)
+            return SAFE_FALLBACK
+        return candidate
+
+    def check_later(self, name: str, on_unsafe: Callable[[str], Awaitable[None]]) -> None:
+        """Under ``serve_then_flag``, moderate an already served name and call ``on_unsafe`` if it fails."""
+        if not settings.moderation_enabled or self.policy != SERVE_THEN_FLAG or not settings.gemini_api_key:
+            return
+        if self.screen(name) is not None:
+            return
+        self._spawn(self._check(name, on_unsafe))
+
+    async def _check(self, name: str, on_unsafe: Callable[[str], Awaitable[None]]) -> None:
+        verdict = await self.verdict(name)
+        if verdict is not None and not verdict.safe:
+            logger.info("Retracting %r: %s", name, verdict.reason)
+            await on_unsafe(name)
+
+    async def verdict(self, name: str) -> Optional[Verdict]:
+        """Model verdict for ``name``, batched with other names; ``None`` if the model gave none."""
+        key = moderation_key(name)
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._in_flight[key] = loop.create_future()
+            self._pending.append(_PendingName(key, name, future))
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_seconds, self._flush)
+        try:
+            return await asyncio.shield(future)
+        except gemini.GeminiError as exc:
+            # Names that passed the blocklist are served rather than failing the request.
+            logger.warning("Moderating %r failed: %s", name, exc)
+            return None
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._spawn(self._run(batch))
+
+    async def _run(self, batch: list[_PendingName]) -> None:
+        try:
+            text = await gemini.get_client().generate_text(
+                gemini.build_moderation_prompt([item.name for item in batch])
+            )
+            labels = gemini.parse_moderation_response(text, len(batch))
+        except Exception as exc:  # noqa: BLE001
+            labels = [None] * len(batch)
+            error: Optional[gemini.GeminiError] = (
+                exc if isinstance(exc, gemini.GeminiError) else gemini.GeminiError(str(exc))
+            )
+        else:
+            error = None
+
+        verdicts = {}
+        for item, label in zip(batch, labels):
+            self._in_flight.pop(item.key, None)
+            if item.future.done():
+                continue
+            if label is None:
+                if error is not None:
+                    item.future.set_exception(error)
+                    item.future.exception()
+                else:
+                    item.future.set_result(None)
+                continue
+            verdict = verdicts[item.key] = Verdict(safe=label[0], reason=label[1])
+            self.verdicts.put(item.key, verdict)
+            item.future.set_result(verdict)
+        if verdicts:
+            writer.submit_nowait(lambda db: _save_verdicts(db, verdicts))
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        self._flush()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def _save_verdicts(db: Session, verdicts: dict[str, Verdict]) -> None:
+    now = int(time.time())
+    rows = [
+        {"key": key, "is_safe": verdict.safe, "reason": verdict.reason, "created_at": now}
+        for key, verdict in verdicts.items()
+    ]
+    db.exec(sqlite_insert(ModerationVerdict).values(rows).on_conflict_do_nothing())
+
+
+moderator = Moderator(
+    policy=settings.moderation_policy,
+    cache_size=settings.moderation_cache_size,
+    window_seconds=settings.moderation_batch_window_ms / 1000,
+    max_size=settings.moderation_batch_max_size,
+)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+from typing import Awaitable, Callable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Calls ``callback`` every ``interval`` seconds on a background task.
+
+    ``callback`` may be a plain function or a coroutine function. A failing
+    call is logged and the next one still runs.
+    """
+
+    def __init__(self, name: str, interval: float, callback: Callable[[], Union[None, Awaitable[None]]]) -> None:
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                result = self.callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # noqa: BLE001
+                logger.exception("Periodic %s failed", self.name)
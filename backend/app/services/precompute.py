@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import heapq
+import itertools
+import logging
+import math
+from collections import Counter, deque
+from typing import Optional
+
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_session, init_db, writer
+from ..models import Element
+from . import gemini
+from .batcher import batcher
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SEED_WEIGHT = 2.0
+RECENCY_WEIGHT = 3.0
+POPULAR_PARTNERS = 8
+
+
+class PrecomputeWorker:
+    """Generates likely-next combinations ahead of players while Gemini is idle.
+
+    Candidate pairs sit in a max-priority queue scored by how many seeds they
+    contain, how popular their elements are and how recently the elements
+    were discovered. The worker takes one pair at a time, only while no
+    interactive generation is running or waiting, and within a per-minute
+    rate and a daily budget.
+    """
+
+    def __init__(self, daily_budget: int, max_per_minute: int, max_queue: int) -> None:
+        self.daily_budget = daily_budget
+        self.max_per_minute = max_per_minute
+        self.max_queue = max_queue
+        self.popularity: Counter[int] = Counter()
+        self.seed_ids: set[int] = set()
+        self.generated_today = 0
+        self._budget_day = dt.date.today()
+        self._recent: deque[int] = deque(maxlen=64)
+        self._expanded: set[int] = set()
+        self._heap: list[tuple[float, int, int, int]] = []
+        self._queued: set[tuple[int, int]] = set()
+        self._sequence = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self.load_candidates()
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def load_candidates(self) -> None:
+        """Queue seed x seed pairs and seeds x the most recent elements."""
+        with get_session() as db:
+            seeds = db.exec(select(Element.id).where(Element.is_seed == True)).all()  # noqa: E712
+            recent = db.exec(
+                select(Element.id).where(Element.is_seed == False).order_by(Element.id.desc()).limit(64)  # noqa: E712
+            ).all()
+        self.seed_ids = set(seeds)
+        self._recent.extend(reversed(recent))
+        for element_id in [*seeds, *reversed(recent)]:
+            self._expand(element_id)
+
+    def observe(self, element_a_id: int, element_b_id: int, result_id: int) -> None:
+        """Record a combine request so future candidates follow what players use."""
+        if not self.enabled:
+            return
+        self.popularity.update((element_a_id, element_b_id, result_id))
+        if result_id not in self._expanded:
+            self._recent.append(result_id)
+            self._expand(result_id)
+
+    def score(self, element_a_id: int, element_b_id: int) -> float:
+        seeds = (element_a_id in self.seed_ids) + (element_b_id in self.seed_ids)
+        popularity = math.log1p(self.popularity[element_a_id]) + math.log1p(self.popularity[element_b_id])
+        recency = 0.0
+        for age, element_id in enumerate(reversed(self._recent)):
+            if element_id in (element_a_id, element_b_id):
+                recency = 1.0 / (1 + age)
+                break
+        return SEED_WEIGHT * seeds + popularity + RECENCY_WEIGHT * recency
+
+    def enqueue(self, element_a_id: int, element_b_id: int) -> None:
+        pair = (min(element_a_id, element_b_id), max(element_a_id, element_b_id))
+        if pair in self._queued or len(self._heap) >= self.max_queue:
+            return
+        self._queued.add(pair)
+        heapq.heappush(self._heap, (-self.score(*pair), next(self._sequence), *pair))
+        self._wake.set()
+
+    def _expand(self, element_id: int) -> None:
+        self._expanded.add(element_id)
+        partners = [*self.seed_ids, *(pid for pid, _ in self.popularity.most_common(POPULAR_PARTNERS))]
+        for partner_id in partners:
+            self.enqueue(element_id, partner_id)
+
+    def _interactive_busy(self) -> bool:
+        client = gemini.get_client()
+        return client.in_flight > 0 or batcher.pending > 0 or client.breaker.state != "closed"
+
+    def _budget_left(self) -> bool:
+        today = dt.date.today()
+        if today != self._budget_day:
+            self._budget_day = today
+            self.generated_today = 0
+        return self.generated_today < self.daily_budget
+
+    async def run(self, stop_when_idle: bool = False) -> None:
+        from .game import precompute_pair
+
+        interval = 60 / self.max_per_minute if self.max_per_minute > 0 else 0
+        while True:
+            if not self._heap:
+                if stop_when_idle:
+                    return
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if not self._budget_left():
+                if stop_when_idle:
+                    return
+                await asyncio.sleep(60)
+                continue
+            if self._interactive_busy():
+                await asyncio.sleep(settings.precompute_idle_poll_seconds)
+                continue
+
+            _, _, element_a_id, element_b_id = heapq.heappop(self._heap)
+            self._queued.discard((element_a_id, element_b_id))
+            try:
+                result_id = await precompute_pair(element_a_id, element_b_id)
+            except gemini.GeminiError as exc:
+                logger.info("Precompute of %s+%s failed: %s", element_a_id, element_b_id, exc)
+                result_id = None
+            except Exception:  # noqa: BLE001
+                # A database error on one pair must not end the worker.
+                logger.exception("Precompute of %s+%s failed", element_a_id, element_b_id)
+                result_id = None
+            if result_id is not None:
+                self.generated_today += 1
+                if result_id not in self._expanded:
+                    self._recent.append(result_id)
+                    self._expand(result_id)
+                await asyncio.sleep(interval)
+
+
+precompute_worker = PrecomputeWorker(
+    daily_budget=settings.precompute_daily_budget,
+    max_per_minute=settings.precompute_max_per_minute,
+    max_queue=settings.precompute_max_queue,
+)
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-generate likely combinations.")
+    parser.add_argument("--budget", type=int, default=settings.precompute_daily_budget)
+    parser.add_argument("--per-minute", type=int, default=settings.precompute_max_per_minute)
+    args = parser.parse_args()
+
+    init_db()
+    worker = PrecomputeWorker(args.budget, args.per_minute, settings.precompute_max_queue)
+    worker.load_candidates()
+    try:
+        await worker.run(stop_when_idle=True)
+    finally:
+        await writer.stop()
+        await gemini.close_client()
+    logger.info("Generated %d combinations", worker.generated_today)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlmodel import func, select
+
+from ..config import get_settings
+from ..database import get_session
+from ..models import Combination, Element
+from .periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_SNAPSHOT_MAGIC = b"STRG"
+_SNAPSHOT_VERSION = 3
+_SNAPSHOT_HEADER = struct.Struct("<4sIqIIq")
+
+# Content checksum of the edges: the sum over rows of a weighted
+# ``(id, a, b, result)`` term modulo a prime, small enough that SQLite can
+# compute it without integer overflow.
+_CHECKSUM_MODULUS = 2_147_483_647
+_CHECKSUM_WEIGHTS = (1, 1_000_003, 999_983, 998_617)
+
+
+def _checksum_term(combination_id: int, element_a_id: int, element_b_id: int, result_id: int) -> int:
+    values = (combination_id, element_a_id, element_b_id, result_id)
+    return sum(value % _CHECKSUM_MODULUS * weight for value, weight in zip(values, _CHECKSUM_WEIGHTS)) % _CHECKSUM_MODULUS
+
+
+class RecipeGraph:
+    """In-memory recipe hypergraph: combination ``i`` is ``(a[i], b[i]) -> result[i]``.
+
+    Edges live in parallel ``array('q')`` columns; per-element adjacency
+    lists hold edge indices. Every element reachable from the seeds keeps
+    its minimal depth (seeds are 0, a result is one more than the deeper of
+    its two ingredients) and the edge that achieves it, so recipe trees are
+    read off directly and new edges only relax what they improve.
+    """
+
+    def __init__(self) -> None:
+        self._clear()
+        # Bumped on every change; the snapshot task only saves when it moved.
+        self.revision = 0
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._saved_revision = 0
+        self._saver = PeriodicTask("recipe snapshot", settings.recipe_snapshot_interval_seconds, self._save_if_changed)
+
+    def __len__(self) -> int:
+        return len(self.result)
+
+    def _clear(self) -> None:
+        self.ids = array("q")
+        self.a = array("q")
+        self.b = array("q")
+        self.result = array("q")
+        self.seeds: set[int] = set()
+        self.depth: dict[int, int] = {}
+        self.best: dict[int, int] = {}
+        self.produced_by: dict[int, array] = {}
+        self.used_in: dict[int, array] = {}
+        # Highest combination id read by ``sync``. In-process adds do not move
+        # it, so rows other processes commit with lower ids are still loaded;
+        # ``_unsynced`` holds the added ids above it so they are not loaded twice.
+        self.last_combination_id = 0
+        self._unsynced: set[int] = set()
+
+    def set_seeds(self, seed_ids: Iterable[int]) -> None:
+        with self._lock:
+            self.seeds = set(seed_ids)
+            for seed_id in self.seeds:
+                self.depth[seed_id] = 0
+                self.best.pop(seed_id, None)
+            self._relax(edge for seed_id in self.seeds for edge in self.used_in.get(seed_id, ()))
+
+    def add(self, combination_id: int, element_a_id: int, element_b_id: int, result_id: int) -> None:
+        with self._lock:
+            if combination_id <= self.last_combination_id or combination_id in self._unsynced:
+                return
+            edge = self._append(combination_id, element_a_id, element_b_id, result_id)
+            self._unsynced.add(combination_id)
+            self.revision += 1
+            self._relax([edge])
+
+    def redirect(self, element_id: int, replacement_id: int) -> None:
+        """Make every combination producing ``element_id`` produce ``replacement_id`` instead."""
+        with self._lock:
+            edges = self.produced_by.pop(element_id, None)
+            if not edges:
+                return
+            for edge in edges:
+                self.result[edge] = replacement_id
+            self.produced_by.setdefault(replacement_id, array("q")).extend(edges)
+            self.revision += 1
+            # Depths can only grow here, which relaxation cannot undo: start over from the seeds.
+            self.depth = {seed_id: 0 for seed_id in self.seeds}
+            self.best = {}
+            self._relax(edge for seed_id in self.seeds for edge in self.used_in.get(seed_id, ()))
+
+    def _append(self, combination_id: int, element_a_id: int, element_b_id: int, result_id: int) -> int:
+        edge = len(self.result)
+        self.ids.append(combination_id)
+        self.a.append(element_a_id)
+        self.b.append(element_b_id)
+        self.result.append(result_id)
+        self.produced_by.setdefault(result_id, array("q")).append(edge)
+        self.used_in.setdefault(element_a_id, array("q")).append(edge)
+        if element_b_id != element_a_id:
+            self.used_in.setdefault(element_b_id, array("q")).append(edge)
+        return edge
+
+    def _relax(self, edges: Iterable[int]) -> None:
+        # Knuth's generalization of Dijkstra to AND-edges: settle results in
+        # order of depth and push every edge whose ingredients are now known.
+        heap: list[tuple[int, int]] = []
+        for edge in edges:
+            self._push(heap, edge)
+        while heap:
+            candidate, edge = heapq.heappop(heap)
+            result_id = self.result[edge]
+            if candidate >= self.depth.get(result_id, candidate + 1):
+                continue
+            self.depth[result_id] = candidate
+            self.best[result_id] = edge
+            for next_edge in self.used_in.get(result_id, ()):
+                self._push(heap, next_edge)
+
+    def _push(self, heap: list[tuple[int, int]], edge: int) -> None:
+        depth_a = self.depth.get(self.a[edge])
+        depth_b = self.depth.get(self.b[edge])
+        if depth_a is None or depth_b is None:
+            return
+        candidate = max(depth_a, depth_b) + 1
+        if candidate < self.depth.get(self.result[edge], candidate + 1):
+            heapq.heappush(heap, (candidate, edge))
+
+    def recipe(self, element_id: int) -> Optional[list[tuple[int, int, int]]]:
+        """Steps ``(a, b, result)`` of a minimal-depth recipe, ingredients first.
+
+        Returns ``[]`` for seeds and ``None`` if the element cannot be made
+        from the seeds.
+        """
+        if element_id not in self.depth:
+            return None
+        steps: list[tuple[int, int, int]] = []
+        done: set[int] = set()
+        stack = [(element_id, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if current in done or current in self.seeds:
+                continue
+            edge = self.best[current]
+            if expanded:
+                done.add(current)
+                steps.append((self.a[edge], self.b[edge], current))
+                continue
+            stack.append((current, True))
+            stack.append((self.b[edge], False))
+            stack.append((self.a[edge], False))
+        return steps
+
+    def sources(self, element_id: int, limit: int = 50) -> list[tuple[int, int]]:
+        """Pairs that produce ``element_id``."""
+        edges = self.produced_by.get(element_id, array("q"))
+        return [(self.a[edge], self.b[edge]) for edge in edges[:limit]]
+
+    def reachable(self, known: Iterable[int], max_steps: Optional[int] = None) -> set[int]:
+        """Elements not in ``known`` that known combinations can make from it.
+
+        With ``max_steps=1`` only direct results of two known elements count;
+        without a limit the full closure is returned.
+        """
+        have = set(known)
+        frontier = set(have)
+        found: set[int] = set()
+        steps = 0
+        while frontier and (max_steps is None or steps < max_steps):
+            steps += 1
+            made: set[int] = set()
+            for element_id in frontier:
+                for edge in self.used_in.get(element_id, ()):
+                    result_id = self.result[edge]
+                    if result_id not in have and self.a[edge] in have and self.b[edge] in have:
+                        made.add(result_id)
+            have |= made
+            found |= made
+            frontier = made
+        return found
+
+    def sync(self, force: bool = False) -> None:
+        """Load combinations stored since the last one seen (e.g. by other workers)."""
+        now = time.monotonic()
+        if not force and now - self._last_sync < settings.search_sync_interval_seconds:
+            return
+        self._last_sync = now
+        with get_session() as db:
+            if not self.seeds:
+                self.set_seeds(db.exec(select(Element.id).where(Element.is_seed == True)))  # noqa: E712
+            rows = db.exec(
+                select(Combination.id, Combination.element_a_id, Combination.element_b_id, Combination.result_element_id)
+                .where(Combination.id > self.last_combination_id)
+                .order_by(Combination.id)
+            ).all()
+        if not rows:
+            return
+        with self._lock:
+            edges = [
+                self._append(combination_id, a_id, b_id, result_id)
+                for combination_id, a_id, b_id, result_id in rows
+                if combination_id not in self._unsynced
+            ]
+            self.last_combination_id = rows[-1][0]
+            self._unsynced = {combination_id for combination_id in self._unsynced if combination_id > rows[-1][0]}
+            if edges:
+                self.revision += 1
+                self._relax(edges)
+
+    def checksum(self) -> int:
+        """Content checksum of the loaded edges, comparable with the database's."""
+        return sum(map(_checksum_term, self.ids, self.a, self.b, self.result))
+
+    def save(self, path: Path) -> None:
+        """Write a snapshot so the next start only loads newer combinations."""
+        with self._lock:
+            depth_ids = array("q", self.depth.keys())
+            depth_values = array("q", self.depth.values())
+            best_ids = array("q", self.best.keys())
+            best_edges = array("q", self.best.values())
+            seeds = array("q", sorted(self.seeds))
+            header = _SNAPSHOT_HEADER.pack(
+                _SNAPSHOT_MAGIC,
+                _SNAPSHOT_VERSION,
+                self.last_combination_id,
+                len(self.result),
+                len(seeds),
+                self.checksum(),
+            )
+            columns = (seeds, self.ids, self.a, self.b, self.result)
+            counts = struct.pack("<II", len(depth_ids), len(best_ids))
+            body = b"".join(column.tobytes() for column in (*columns, depth_ids, depth_values, best_ids, best_edges))
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(header + counts + body)
+        os.replace(tmp_path, path)
+
+    def restore(self, path: Path) -> None:
+        """Replace the graph with a snapshot written by ``save``."""
+        data = path.read_bytes()
+        magic, version, last_id, edge_count, seed_count, checksum = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported recipe snapshot: {path}")
+        offset = _SNAPSHOT_HEADER.size
+        depth_count, best_count = struct.unpack_from("<II", data, offset)
+        offset += 8
+
+        def column(count: int) -> array:
+            nonlocal offset
+            values = array("q")
+            values.frombytes(data[offset : offset + 8 * count])
+            offset += 8 * count
+            return values
+
+        with self._lock:
+            self._clear()
+            self.seeds = set(column(seed_count))
+            edges = zip(column(edge_count), column(edge_count), column(edge_count), column(edge_count))
+            for combination_id, element_a_id, element_b_id, result_id in edges:
+                self._append(combination_id, element_a_id, element_b_id, result_id)
+            self.depth = dict(zip(column(depth_count), column(depth_count)))
+            self.best = dict(zip(column(best_count), column(best_count)))
+            self.last_combination_id = last_id
+            self._unsynced = {combination_id for combination_id in self.ids if combination_id > last_id}
+            if self.checksum() != checksum:
+                raise ValueError(f"Corrupt recipe snapshot: {path}")
+
+    def _matches_database(self) -> bool:
+        """Whether the loaded edges are exactly the stored combinations up to the newest one.
+
+        Compares the row count and the content checksum, so retractions that
+        rewrote older rows after the snapshot was taken are caught too.
+        """
+        if not self.ids:
+            return True
+        newest = max(self.ids)
+        columns = (Combination.id, Combination.element_a_id, Combination.element_b_id, Combination.result_element_id)
+        term = sum(column % _CHECKSUM_MODULUS * weight for column, weight in zip(columns, _CHECKSUM_WEIGHTS))
+        with get_session() as db:
+            count, checksum = db.exec(
+                select(func.count(), func.coalesce(func.sum(term % _CHECKSUM_MODULUS), 0)).where(Combination.id <= newest)
+            ).one()
+        return count == len(self) and checksum == self.checksum()
+
+    def warm_up(self) -> None:
+        """Start from the snapshot when there is a usable one, then catch up from the database."""
+        path = Path(settings.recipe_snapshot_path)
+        if path.exists():
+            try:
+                self.restore(path)
+            except (OSError, ValueError, struct.error):
+                logger.warning("Ignoring unreadable recipe snapshot %s", path, exc_info=True)
+                with self._lock:
+                    self._clear()
+            else:
+                # A snapshot left over from another database would serve wrong recipes.
+                if not self._matches_database():
+                    logger.warning("Ignoring recipe snapshot %s: it does not match the database", path)
+                    with self._lock:
+                        self._clear()
+        self.sync(force=True)
+        logger.info("Recipe graph ready with %d combinations", len(self))
+
+    def start(self) -> None:
+        self._saved_revision = self.revision
+        self._saver.start()
+
+    async def stop(self) -> None:
+        await self._saver.stop()
+        await asyncio.to_thread(self.save, Path(settings.recipe_snapshot_path))
+
+    async def _save_if_changed(self) -> None:
+        if self.revision == self._saved_revision:
+            return
+        self._saved_revision = self.revision
+        await asyncio.to_thread(self.save, Path(settings.recipe_snapshot_path))
+
+
+recipe_graph = RecipeGraph()
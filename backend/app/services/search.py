@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import json
+import secrets
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_session
+from ..models import Element, ModerationVerdict
+from .text import search_key
+
+settings = get_settings()
+
+# Single characters match most of the catalog, so scanning the id list in
+# order fills a page almost immediately; only 2- and 3-grams are indexed.
+GRAM_SIZES = (2, 3)
+
+
+@dataclass(frozen=True)
+class IndexedElement:
+    id: int
+    name: str
+    emoji: str
+    is_seed: bool
+    key: str
+    # Pre-serialized ``ElementSummary`` JSON, reused by every response.
+    payload: bytes
+
+
+class ElementSearchIndex:
+    """In-memory n-gram index over normalized element names.
+
+    Results are ordered seeds first, then by id, which is also insertion
+    order. Non-seed ids and every posting list are therefore append-only
+    sorted arrays, and a page is produced by walking the shortest posting
+    list from the cursor until ``limit`` verified matches are found.
+    """
+
+    def __init__(self) -> None:
+        self._elements: dict[int, IndexedElement] = {}
+        self._seed_ids: list[int] = []
+        self._ids = array("q")
+        self._postings: dict[str, array] = {}
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        # Highest id read by ``sync``. In-process adds do not move it: they can
+        # run ahead of rows another process committed with lower ids.
+        self._synced_id = 0
+        # Change log: element ids as they are added, negated ids as they are
+        # removed. Revision ``"<epoch>:<n>"`` is the catalog after the first
+        # ``n`` changes. The epoch is random per process, so revisions from
+        # another worker or an earlier run never match this log.
+        self.epoch = secrets.token_hex(8)
+        self._log = array("q")
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    @property
+    def version(self) -> str:
+        """Catalog revision; every add and removal bumps it."""
+        return f"{self.epoch}:{len(self._log)}"
+
+    def get(self, element_id: int) -> Optional[IndexedElement]:
+        return self._elements.get(element_id)
+
+    def add(self, element: Element) -> None:
+        with self._lock:
+            self._add_locked(element)
+
+    def add_many(self, elements: Iterable[Element]) -> None:
+        with self._lock:
+            for element in elements:
+                self._add_locked(element)
+
+    def remove(self, element_id: int) -> None:
+        """Hide an element, e.g. one retracted by moderation. Stale postings are skipped on read."""
+        with self._lock:
+            entry = self._elements.pop(element_id, None)
+            if entry is None:
+                return
+            ids = self._seed_ids if entry.is_seed else self._ids
+            index = bisect_right(ids, element_id) - 1
+            if index >= 0 and ids[index] == element_id:
+                del ids[index]
+            self._log.append(-element_id)
+
+    def _add_locked(self, element: Element) -> None:
+        if element.id in self._elements:
+            return
+        entry = IndexedElement(
+            id=element.id,
+            name=element.name,
+            emoji=element.emoji,
+            is_seed=element.is_seed,
+            key=search_key(element.name),
+            payload=_summary_json(element),
+        )
+        self._elements[entry.id] = entry
+        self._log.append(entry.id)
+        if entry.is_seed:
+            self._seed_ids.append(entry.id)
+            self._seed_ids.sort()
+            return
+        # Elements from other workers can arrive slightly out of order.
+        _insert_sorted(self._ids, entry.id)
+        for gram in _grams(entry.key):
+            _insert_sorted(self._postings.setdefault(gram, array("q")), entry.id)
+
+    def sync(self, force: bool = False) -> None:
+        """Pull elements inserted by other processes since the last synced id."""
+        now = time.monotonic()
+        if not force and now - self._last_sync < settings.search_sync_interval_seconds:
+            return
+        self._last_sync = now
+        with get_session() as db:
+            retracted = select(ModerationVerdict.element_id).where(ModerationVerdict.element_id.is_not(None))
+            rows = db.exec(
+                select(Element)
+                .where(Element.id > self._synced_id, Element.id.not_in(retracted))
+                .order_by(Element.id)
+            ).all()
+        if rows:
+            self.add_many(rows)
+            self._synced_id = rows[-1].id
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> tuple[list[IndexedElement], Optional[int]]:
+        """Return one page of matches and the cursor for the next page."""
+        key = search_key(query or "")
+        postings = self._ids
+        grams = list(_grams(key))
+        if grams:
+            postings = min(
+                (self._postings.get(gram, array("q")) for gram in grams), key=len
+            )
+        return self._page(self._ordered(self._seed_ids, postings, cursor), key, limit)
+
+    def search_within(
+        self,
+        ids: Iterable[int],
+        query: Optional[str] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> tuple[list[IndexedElement], Optional[int]]:
+        """Like ``search``, restricted to ``ids`` given in ascending order (e.g. a session's discoveries)."""
+        seed_ids: list[int] = []
+        other_ids = array("q")
+        for element_id in ids:
+            entry = self._elements.get(element_id)
+            if entry is not None:
+                (seed_ids if entry.is_seed else other_ids).append(element_id)
+        return self._page(self._ordered(seed_ids, other_ids, cursor), search_key(query or ""), limit)
+
+    def _page(
+        self, candidates: Iterator[int], key: str, limit: int
+    ) -> tuple[list[IndexedElement], Optional[int]]:
+        page: list[IndexedElement] = []
+        for element_id in candidates:
+            entry = self._elements.get(element_id)
+            if entry is not None and key in entry.key:
+                page.append(entry)
+                if len(page) > limit:
+                    break
+        if len(page) > limit:
+            return page[:limit], page[limit - 1].id
+        return page, None
+
+    def since(
+        self, version: str, limit: int = 100
+    ) -> tuple[list[IndexedElement], list[int], Optional[str], bool]:
+        """Changes after ``version``: added elements, removed ids, the next cursor and a reset flag.
+
+        A ``version`` this process did not hand out (another worker or run,
+        or empty for a new client) replays the whole log with ``reset`` set:
+        the client drops its copy and rebuilds it from the pages.
+        """
+        end = len(self._log)
+        epoch, _, position_text = version.partition(":")
+        reset = epoch != self.epoch or not position_text.isdigit() or int(position_text) > end
+        position = 0 if reset else int(position_text)
+        added: list[IndexedElement] = []
+        removed: list[int] = []
+        while position < end and len(added) + len(removed) < limit:
+            element_id = self._log[position]
+            position += 1
+            if element_id < 0:
+                removed.append(-element_id)
+                continue
+            # Skips elements removed later in the log.
+            entry = self._elements.get(element_id)
+            if entry is not None:
+                added.append(entry)
+        next_cursor = f"{self.epoch}:{position}" if position < end else None
+        return added, removed, next_cursor, reset
+
+    def _ordered(self, seed_ids: list[int], ids: array, cursor: Optional[int]) -> Iterator[int]:
+        """Yield ``seed_ids`` then ``ids`` (both ascending), resuming after ``cursor``."""
+        cursor_entry = self._elements.get(cursor) if cursor is not None else None
+        if cursor is None or (cursor_entry is not None and cursor_entry.is_seed):
+            start = bisect_right(seed_ids, cursor) if cursor is not None else 0
+            yield from seed_ids[start:]
+            cursor = None
+        start = bisect_right(ids, cursor) if cursor is not None else 0
+        yield from _iter_from(ids, start)
+
+
+def _grams(key: str) -> Iterator[str]:
+    seen: set[str] = set()
+    for size in GRAM_SIZES:
+        for index in range(len(key) - size + 1):
+            gram = key[index : index + size]
+            if gram not in seen:
+                seen.add(gram)
+                yield gram
+
+
+def _iter_from(values: array, start: int) -> Iterator[int]:
+    # Index instead of slicing so large arrays are not copied per request.
+    for index in range(start, len(values)):
+        yield values[index]
+
+
+def _summary_json(element: Element) -> bytes:
+    return json.dumps(
+        {"id": element.id, "name_tr": element.name, "emoji": element.emoji, "is_seed": element.is_seed},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def _insert_sorted(values: array, value: int) -> None:
+    if not values or values[-1] < value:
+        values.append(value)
+    else:
+        values.insert(bisect_right(values, value), value)
+
+
+element_index = ElementSearchIndex()
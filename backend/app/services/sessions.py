@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from ..config import get_settings
+from ..database import chunked_rows, get_session, writer
+from ..models import Element, SessionProgress
+from .bitmap import CompactBitmap
+from .periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class _ActiveSession:
+    discovered: CompactBitmap
+    dirty: bool = False
+
+
+class SessionStore:
+    """Per-session discovered element sets, cached in memory and persisted lazily.
+
+    Active sessions live in an LRU of compact bitmaps. Changes only mark a
+    session dirty; dirty sessions are written back in batches by a periodic
+    flush and when they are evicted. Snapshots stay readable from memory
+    until their write is committed. Must be used from the event loop.
+    """
+
+    def __init__(self, max_active: int) -> None:
+        self.max_active = max_active
+        self._active: OrderedDict[str, _ActiveSession] = OrderedDict()
+        self._unsaved: dict[str, bytes] = {}
+        self._seed_ids: Optional[list[int]] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._flusher = PeriodicTask("session flush", settings.session_flush_interval_seconds, self.flush)
+
+    def create(self) -> str:
+        session_id = uuid.uuid4().hex
+        self._remember(session_id, _ActiveSession(CompactBitmap(self._seeds()), dirty=True))
+        return session_id
+
+    def discovered(self, session_id: str) -> CompactBitmap:
+        return self._get(session_id).discovered
+
+    def contains(self, session_id: str, element_id: int) -> bool:
+        return element_id in self._get(session_id).discovered
+
+    def add(self, session_id: str, element_id: int) -> bool:
+        """Record a discovery; returns True if it is new for this session."""
+        entry = self._get(session_id)
+        added = entry.discovered.add(element_id)
+        entry.dirty = entry.dirty or added
+        return added
+
+    def common(self, session_id: str, other_session_id: str) -> CompactBitmap:
+        return self.discovered(session_id) & self.discovered(other_session_id)
+
+    def _get(self, session_id: str) -> _ActiveSession:
+        entry = self._active.get(session_id)
+        if entry is not None:
+            self._active.move_to_end(session_id)
+            return entry
+        data = self._unsaved.get(session_id)
+        if data is None:
+            with get_session() as db:
+                row = db.get(SessionProgress, session_id)
+                data = row.discovered if row else None
+        if data is None:
+            # Unknown ids start like a new session so clients can pick their own.
+            # Not dirty: reads must not store a row; the first discovery does.
+            entry = _ActiveSession(CompactBitmap(self._seeds()))
+        else:
+            entry = _ActiveSession(CompactBitmap.from_bytes(data))
+        return self._remember(session_id, entry)
+
+    def _remember(self, session_id: str, entry: _ActiveSession) -> _ActiveSession:
+        self._active[session_id] = entry
+        evicted = {}
+        while len(self._active) > self.max_active:
+            old_id, old_entry = self._active.popitem(last=False)
+            if old_entry.dirty:
+                evicted[old_id] = old_entry.discovered.to_bytes()
+        if evicted:
+            self._persist(evicted)
+        return entry
+
+    def _seeds(self) -> list[int]:
+        if self._seed_ids is None:
+            with get_session() as db:
+                self._seed_ids = list(db.exec(select(Element.id).where(Element.is_seed == True)))  # noqa: E712
+        return self._seed_ids
+
+    def flush(self) -> None:
+        dirty = {}
+        for session_id, entry in self._active.items():
+            if entry.dirty:
+                dirty[session_id] = entry.discovered.to_bytes()
+                entry.dirty = False
+        if dirty:
+            self._persist(dirty)
+
+    def _persist(self, sessions: dict[str, bytes]) -> None:
+        self._unsaved.update(sessions)
+        task = asyncio.get_running_loop().create_task(self._save(sessions))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _save(self, sessions: dict[str, bytes]) -> None:
+        try:
+            await writer.submit(lambda db: _save_rows(db, sessions))
+        except Exception:  # noqa: BLE001
+            # Keep the snapshots in memory; the sessions stay readable.
+            logger.exception("Saving %d sessions failed", len(sessions))
+            return
+        for session_id, data in sessions.items():
+            if self._unsaved.get(session_id) is data:
+                del self._unsaved[session_id]
+
+    def start(self) -> None:
+        self._flusher.start()
+
+    async def stop(self) -> None:
+        await self._flusher.stop()
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+
+def _save_rows(db: Session, sessions: dict[str, bytes]) -> None:
+    now = int(time.time())
+    rows = [{"session_id": key, "discovered": data, "updated_at": now} for key, data in sessions.items()]
+    for chunk in chunked_rows(rows):
+        statement = sqlite_insert(SessionProgress).values(chunk)
+        db.exec(
+            statement.on_conflict_do_update(
+                index_elements=["session_id"],
+                set_={"discovered": statement.excluded.discovered, "updated_at": statement.excluded.updated_at},
+            )
+        )
+
+
+session_store = SessionStore(max_active=settings.session_cache_size)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import time
+from array import array
+from collections import Counter
+from typing import Hashable, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, delete, func, select
+
+from ..config import get_settings
+from ..database import get_session, writer
+from ..models import CombinationLog, StatsBucket
+from .periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# (resolution, age after which buckets are folded into the next resolution)
+ROLLUPS = ((MINUTE, HOUR, DAY), (HOUR, DAY, 30 * DAY))
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter counter: the top keys of a stream in ``capacity`` slots.
+
+    Counts are upper bounds; ``count - error`` is a guaranteed lower bound.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counts: dict[Hashable, list[int]] = {}
+        # Min-heap of (count, key) with stale entries skipped lazily.
+        self._heap: list[tuple[int, Hashable]] = []
+
+    def add(self, key: Hashable, amount: int = 1) -> None:
+        entry = self.counts.get(key)
+        if entry is None:
+            if len(self.counts) < self.capacity:
+                entry = self.counts[key] = [0, 0]
+            else:
+                floor, evicted = self._pop_min()
+                del self.counts[evicted]
+                entry = self.counts[key] = [floor, floor]
+        entry[0] += amount
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 8 * self.capacity:
+            self._heap = [(count, k) for k, (count, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> tuple[int, Hashable]:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self.counts.get(key)
+            if entry is not None and entry[0] == count:
+                return count, key
+
+    def top(self, k: int) -> list[tuple[Hashable, int]]:
+        return [(key, entry[0]) for key, entry in heapq.nlargest(k, self.counts.items(), key=lambda item: item[1][0])]
+
+
+class CountMinSketch:
+    """Fixed-size frequency estimator; never undercounts."""
+
+    def __init__(self, width: int, depth: int) -> None:
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def _indexes(self, key: Hashable) -> list[int]:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * i : 8 * i + 8], "little") % self.width for i in range(self.depth)]
+
+    def add(self, key: Hashable, amount: int = 1) -> None:
+        for row, index in zip(self.rows, self._indexes(key)):
+            row[index] += amount
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+
+class StatsAggregator:
+    """Streaming combination statistics, updated per event in O(1).
+
+    Events are appended to ``combination_logs`` through the background writer
+    and folded into heavy-hitter tables for elements and pairs, a count-min
+    sketch for pair lookups and per-minute counters. Minute counters are
+    flushed to ``stats_buckets`` periodically and rolled up to coarser
+    buckets as they age, so reading the stats never touches the raw log.
+    """
+
+    def __init__(self, top_capacity: int) -> None:
+        self.total = 0
+        self.elements = SpaceSaving(top_capacity)
+        self.pairs = SpaceSaving(top_capacity)
+        self.pair_sketch = CountMinSketch(width=1 << 14, depth=4)
+        self.minutes: Counter[int] = Counter()
+        self._unflushed: Counter[int] = Counter()
+        self._last_rollup = 0.0
+        self._flusher = PeriodicTask("stats flush", settings.stats_flush_interval_seconds, self._tick)
+
+    def record(self, element_a_id: int, element_b_id: int, result_id: int, now: Optional[float] = None) -> None:
+        timestamp = int(now if now is not None else time.time())
+        writer.submit_nowait(
+            lambda db: db.add(
+                CombinationLog(
+                    element_a_id=element_a_id,
+                    element_b_id=element_b_id,
+                    result_element_id=result_id,
+                    created_at=timestamp,
+                )
+            )
+        )
+        self._count(element_a_id, element_b_id, result_id)
+        minute = timestamp - timestamp % MINUTE
+        self.minutes[minute] += 1
+        self._unflushed[minute] += 1
+
+    def _count(self, element_a_id: int, element_b_id: int, result_id: int) -> None:
+        pair = (min(element_a_id, element_b_id), max(element_a_id, element_b_id))
+        self.total += 1
+        self.elements.add(element_a_id)
+        if element_b_id != element_a_id:
+            self.elements.add(element_b_id)
+        self.pairs.add(pair)
+        self.pair_sketch.add(pair)
+
+    def estimate_pair(self, element_a_id: int, element_b_id: int) -> int:
+        return self.pair_sketch.estimate((min(element_a_id, element_b_id), max(element_a_id, element_b_id)))
+
+    def timeline(self, now: Optional[float] = None) -> list[tuple[int, int]]:
+        """Events per minute for the last hour."""
+        current = int(now if now is not None else time.time())
+        current -= current % MINUTE
+        return [(start, self.minutes.get(start, 0)) for start in range(current - HOUR + MINUTE, current + 1, MINUTE)]
+
+    def warm_up(self) -> None:
+        """Rebuild in-memory aggregates from the newest log entries and stored buckets."""
+        with get_session() as db:
+            # The log is append-only, so the highest id is the event count.
+            self.total = db.exec(select(func.max(CombinationLog.id))).one() or 0
+            rows = db.exec(
+                select(CombinationLog.element_a_id, CombinationLog.element_b_id, CombinationLog.result_element_id)
+                .order_by(CombinationLog.id.desc())
+                .limit(settings.stats_warmup_events)
+            ).all()
+            since = int(time.time()) - HOUR
+            buckets = db.exec(
+                select(StatsBucket).where(StatsBucket.resolution == MINUTE, StatsBucket.bucket_start >= since)
+            ).all()
+        total = self.total
+        for row in reversed(rows):
+            self._count(*row)
+        self.total = total
+        for bucket in buckets:
+            self.minutes[bucket.bucket_start] = bucket.count
+
+    def flush(self) -> None:
+        """Persist minute counters accumulated since the last flush."""
+        if not self._unflushed:
+            return
+        pending, self._unflushed = self._unflushed, Counter()
+        writer.submit_nowait(lambda db: _add_to_buckets(db, MINUTE, pending))
+        horizon = int(time.time()) - HOUR
+        for minute in [m for m in self.minutes if m < horizon]:
+            del self.minutes[minute]
+
+    def start(self) -> None:
+        self._flusher.start()
+
+    async def stop(self) -> None:
+        await self._flusher.stop()
+        self.flush()
+
+    async def _tick(self) -> None:
+        self.flush()
+        if time.monotonic() - self._last_rollup >= settings.stats_rollup_interval_seconds:
+            self._last_rollup = time.monotonic()
+            try:
+                await writer.submit(rollup_buckets)
+            except Exception:  # noqa: BLE001
+                logger.exception("Stats rollup failed")
+
+
+def _add_to_buckets(db: Session, resolution: int, counts: Counter[int]) -> None:
+    rows = [{"resolution": resolution, "bucket_start": start, "count": count} for start, count in counts.items()]
+    statement = sqlite_insert(StatsBucket).values(rows)
+    db.exec(
+        statement.on_conflict_do_update(
+            index_elements=["resolution", "bucket_start"],
+            set_={"count": StatsBucket.count + statement.excluded.count},
+        )
+    )
+
+
+def rollup_buckets(db: Session, now: Optional[float] = None) -> None:
+    """Fold aged buckets into the next coarser resolution.
+
+    Minute buckets older than a day become hour buckets, and hour buckets
+    older than 30 days become day buckets.
+    """
+    current = int(now if now is not None else time.time())
+    for resolution, target, max_age in ROLLUPS:
+        cutoff = current - max_age
+        cutoff -= cutoff % target
+        old = db.exec(
+            select(StatsBucket).where(StatsBucket.resolution == resolution, StatsBucket.bucket_start < cutoff)
+        ).all()
+        if not old:
+            continue
+        folded: Counter[int] = Counter()
+        for bucket in old:
+            folded[bucket.bucket_start - bucket.bucket_start % target] += bucket.count
+        _add_to_buckets(db, target, folded)
+        db.exec(
+            delete(StatsBucket).where(StatsBucket.resolution == resolution, StatsBucket.bucket_start < cutoff)
+        )
+
+
+stats_aggregator = StatsAggregator(top_capacity=settings.stats_top_capacity)
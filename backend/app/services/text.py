@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import unicodedata
+
+_TURKISH_UPPER = str.maketrans({"I": "ı", "İ": "i"})
+
+
+def turkish_lower(text: str) -> str:
+    """Lowercase with Turkish rules (``I`` -> ``ı``, ``İ`` -> ``i``).
+
+    ``str.casefold`` turns ``İ`` into ``i`` plus a combining dot, which never
+    matches a plain ``i`` typed by the player.
+    """
+    return unicodedata.normalize("NFC", text).translate(_TURKISH_UPPER).lower()
+
+
+def search_key(text: str) -> str:
+    """Fold text for search: Turkish lowercase, dotless ``ı`` matched as ``i``."""
+    return " ".join(turkish_lower(text).replace("ı", "i").split())
@@ -0,0 +1,169 @@
+"""Local stand-in for the Gemini REST API, for benchmarks and CI.
+
+Run it from ``backend/``::
+
+    python -m bench.fake_gemini --port 8090 --latency-ms 400 --jitter-ms 150 --error-rate 0.02
+
+and point the API at it::
+
+    GEMINI_API_KEY=fake
+    GEMINI_ENDPOINT=http://127.0.0.1:8090/v1beta/models/{model}:generateContent
+    GEMINI_STREAM_ENDPOINT=http://127.0.0.1:8090/v1beta/models/{model}:streamGenerateContent?alt=sse
+    RATE_LIMIT_PER_DAY=1000000
+
+Single-pair, batched and moderation prompts get answers in the format the
+API parses. ``GET /stats`` returns request counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+EMOJIS = ("✨", "🔥", "💧", "🌱", "💨", "🍵", "🌋", "🚌", "🕊", "🎓", "⚽", "🥨", "🌆", "😴", "🫖")
+
+_NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*\.\s*(.+)$")
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 300.0
+    jitter_ms: float = 100.0
+    per_item_ms: float = 20.0
+    chunk_ms: float = 30.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    malformed_rate: float = 0.0
+    unsafe_rate: float = 0.0
+    # Number of distinct result names; 0 gives every pair its own name.
+    distinct_results: int = 0
+    fixed: Optional[str] = None
+    seed: Optional[int] = None
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+    rng = random.Random(config.seed)
+    counters: Counter[str] = Counter()
+
+    async def delay(items: int, fraction: float = 1.0) -> None:
+        latency = rng.gauss(config.latency_ms, config.jitter_ms) + config.per_item_ms * max(items - 1, 0)
+        await asyncio.sleep(max(latency * fraction, 0.0) / 1000)
+
+    def element_line(pair: str) -> str:
+        if rng.random() < config.malformed_rate:
+            return "?"
+        if config.fixed:
+            return config.fixed
+        digest = int.from_bytes(hashlib.blake2b(pair.encode(), digest_size=8).digest(), "little")
+        number = digest % config.distinct_results if config.distinct_results else digest
+        return f"{EMOJIS[digest % len(EMOJIS)]} Sentez {number:x}"
+
+    def verdict_line() -> str:
+        return "SAKINCALI: test" if rng.random() < config.unsafe_rate else "GÜVENLİ"
+
+    def answer(prompt: str) -> tuple[str, int]:
+        lines = prompt.splitlines()
+        if "Denetlenecek isimler" in prompt:
+            counters["moderation"] += 1
+            numbers = [match.group(1) for match in map(_NUMBERED_LINE.match, lines) if match]
+            return "\n".join(f"{number}. {verdict_line()}" for number in numbers), len(numbers)
+        pairs = [match for match in map(_NUMBERED_LINE.match, lines) if match and "->" in match.group(2)]
+        if pairs:
+            counters["batch"] += 1
+            counters["batched_pairs"] += len(pairs)
+            text = "\n".join(f"{match.group(1)}. {element_line(match.group(2))}" for match in pairs)
+            return text, len(pairs)
+        counters["single"] += 1
+        pair = next((line for line in reversed(lines) if "->" in line), prompt)
+        return element_line(pair), 1
+
+    def fail() -> Optional[Response]:
+        if rng.random() < config.error_rate:
+            counters["errors"] += 1
+            return Response(status_code=config.error_status)
+        return None
+
+    @app.post("/v1beta/models/{target}")
+    async def generate(target: str, request: Request) -> Response:
+        payload = await request.json()
+        prompt = payload["contents"][0]["parts"][0]["text"]
+        text, items = answer(prompt)
+        if target.endswith(":streamGenerateContent"):
+            counters["stream"] += 1
+            error = fail()
+            if error is not None:
+                return error
+            return StreamingResponse(stream(text, items), media_type="text/event-stream")
+        await delay(items)
+        error = fail()
+        if error is not None:
+            return error
+        return Response(content=json.dumps(_body(text)), media_type="application/json")
+
+    async def stream(text: str, items: int) -> AsyncIterator[bytes]:
+        # Time to first token is about half the configured latency.
+        await delay(items, fraction=0.5)
+        size = 4
+        for start in range(0, len(text), size):
+            if start:
+                await asyncio.sleep(config.chunk_ms / 1000)
+            yield f"data: {json.dumps(_body(text[start : start + size]))}\r\n\r\n".encode()
+
+    @app.get("/stats")
+    def stats() -> dict:
+        return dict(counters)
+
+    return app
+
+
+def _body(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Gemini generateContent server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=FakeConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=FakeConfig.jitter_ms)
+    parser.add_argument("--per-item-ms", type=float, default=FakeConfig.per_item_ms, help="extra latency per batched item")
+    parser.add_argument("--chunk-ms", type=float, default=FakeConfig.chunk_ms, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=FakeConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=FakeConfig.error_status)
+    parser.add_argument("--malformed-rate", type=float, default=FakeConfig.malformed_rate)
+    parser.add_argument("--unsafe-rate", type=float, default=FakeConfig.unsafe_rate)
+    parser.add_argument("--distinct-results", type=int, default=FakeConfig.distinct_results)
+    parser.add_argument("--fixed", help='answer every pair with this line, e.g. "🍵 Çay"')
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        per_item_ms=args.per_item_ms,
+        chunk_ms=args.chunk_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        malformed_rate=args.malformed_rate,
+        unsafe_rate=args.unsafe_rate,
+        distinct_results=args.distinct_results,
+        fixed=args.fixed,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Load generator for the combine and element endpoints.
+
+Seed a synthetic catalog once, then run against a live API (ideally backed
+by ``bench.fake_gemini``)::
+
+    python -m bench.loadgen seed --size 100000
+    python -m bench.loadgen run --url http://127.0.0.1:8049 --size 100000 --concurrency 64 --duration 60
+
+Pairs are drawn from a Zipf distribution over the catalog, so a few
+elements dominate as they do in real play and the cache sees a realistic
+mix of hits and misses. Reports throughput and p50/p95/p99 per operation
+and the cache hit ratios from ``/metrics``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_EMOJIS = ("🧪", "🧩", "🔮", "🪐", "🧱", "🪵", "🧲", "🫧")
+SEARCH_PREFIXES = ("s", "a", "su", "at", "to", "ha", "sen", "sent")
+
+
+def synthetic_name(index: int) -> str:
+    return f"Sentetik {index}"
+
+
+def catalog(size: int) -> list[str]:
+    """Element names in popularity order: the four seeds, then ``size`` synthetic elements."""
+    from app.seed import SEED_ELEMENTS
+
+    return [item["name"] for item in SEED_ELEMENTS] + [synthetic_name(index) for index in range(size)]
+
+
+class ZipfSampler:
+    """Draws indexes ``0..n-1`` with probability proportional to ``1 / (rank + 1) ** exponent``."""
+
+    def __init__(self, n: int, exponent: float, rng: random.Random) -> None:
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+    def sample(self) -> int:
+        return bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: defaultdict[str, list[float]] = defaultdict(list)
+        self.statuses: defaultdict[str, Counter] = defaultdict(Counter)
+
+    def record(self, operation: str, status: int, seconds: float) -> None:
+        self.statuses[operation][status] += 1
+        if status < 400:
+            self.latencies[operation].append(seconds)
+
+    def summary(self, elapsed: float) -> dict:
+        report = {}
+        for operation, statuses in sorted(self.statuses.items()):
+            ordered = sorted(self.latencies[operation])
+            report[operation] = {
+                "requests": sum(statuses.values()),
+                "errors": {str(status): count for status, count in statuses.items() if status >= 400},
+                "throughput": sum(statuses.values()) / elapsed,
+                "p50_ms": percentile(ordered, 0.50) * 1000,
+                "p95_ms": percentile(ordered, 0.95) * 1000,
+                "p99_ms": percentile(ordered, 0.99) * 1000,
+            }
+        return report
+
+
+async def _combine(client: httpx.AsyncClient, recorder: Recorder, body: dict, stream: bool) -> None:
+    started = time.perf_counter()
+    if not stream:
+        response = await client.post("/api/combine", json=body)
+        recorder.record("combine", response.status_code, time.perf_counter() - started)
+        return
+    async with client.stream("POST", "/api/combine/stream", json=body) as response:
+        if response.status_code >= 400:
+            await response.aread()
+            recorder.record("combine_stream", response.status_code, time.perf_counter() - started)
+            return
+        first = True
+        async for line in response.aiter_lines():
+            if first and line.startswith("data:"):
+                recorder.record("combine_stream_first_event", response.status_code, time.perf_counter() - started)
+                first = False
+    recorder.record("combine_stream", response.status_code, time.perf_counter() - started)
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    names: list[str],
+    sampler: ZipfSampler,
+    sessions: list[Optional[str]],
+    args: argparse.Namespace,
+    deadline: float,
+) -> None:
+    rng = sampler.rng
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < args.elements_ratio:
+                started = time.perf_counter()
+                response = await client.get("/api/elements", params={"q": rng.choice(SEARCH_PREFIXES)})
+                recorder.record("elements", response.status_code, time.perf_counter() - started)
+                continue
+            body = {
+                "elementA": names[sampler.sample()],
+                "elementB": names[sampler.sample()],
+                "sessionId": rng.choice(sessions),
+            }
+            await _combine(client, recorder, body, args.stream)
+        except httpx.HTTPError as exc:
+            recorder.record("transport", 599, 0.0)
+            logger.debug("Request failed: %s", exc)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    names = catalog(args.size)
+    sampler = ZipfSampler(len(names), args.zipf, rng)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        sessions: list[Optional[str]] = [None]
+        if args.sessions:
+            sessions = [(await client.post("/api/session")).json()["sessionId"] for _ in range(args.sessions)]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(_worker(client, recorder, names, sampler, sessions, args, deadline) for _ in range(args.concurrency))
+        )
+        elapsed = time.perf_counter() - started
+        metrics_text = (await client.get("/metrics")).text
+
+    report = recorder.summary(elapsed)
+    for operation, stats in report.items():
+        print(
+            f"{operation:28} {stats['requests']:8d} req {stats['throughput']:9.1f} req/s "
+            f"p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms"
+            + (f"  errors {stats['errors']}" if stats["errors"] else "")
+        )
+    for line in metrics_text.splitlines():
+        if line.startswith(("sonsuz_combination_cache_hit_ratio", "sonsuz_combination_cache_memory_hit_ratio")):
+            print(line)
+    return report
+
+
+def seed(size: int) -> None:
+    from app.database import get_session, init_db
+    from app.seed import seed_base_elements
+    from app.services.game import upsert_elements
+
+    init_db()
+    seed_base_elements()
+    chunk = 10_000
+    for start in range(0, size, chunk):
+        items = [
+            (synthetic_name(index), SYNTHETIC_EMOJIS[index % len(SYNTHETIC_EMOJIS)])
+            for index in range(start, min(start + chunk, size))
+        ]
+        with get_session() as db:
+            upsert_elements(db, items)
+            db.commit()
+        logger.info("Seeded %d/%d synthetic elements", min(start + chunk, size), size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Sonsuz Türkiye API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="insert the synthetic catalog into DATABASE_URL")
+    seed_parser.add_argument("--size", type=int, default=10_000)
+
+    run_parser = commands.add_parser("run", help="generate load against a running API")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8049")
+    run_parser.add_argument("--size", type=int, default=10_000, help="synthetic catalog size used by seed")
+    run_parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of element popularity")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    run_parser.add_argument("--elements-ratio", type=float, default=0.1, help="share of element searches")
+    run_parser.add_argument("--sessions", type=int, default=100, help="distinct sessions; 0 sends none")
+    run_parser.add_argument("--stream", action="store_true", help="use /api/combine/stream")
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--seed", type=int)
+    run_parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed(args.size)
+        return
+    report = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"run_id": uuid.uuid4().hex, "args": vars(args), "report": report}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    main()
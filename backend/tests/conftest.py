@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+# Settings are read once at import time; keep tests away from the real
+# database, snapshot and API key before anything imports ``app``.
+_scratch = Path(tempfile.mkdtemp(prefix="sonsuz-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch / 'test.db'}"
+os.environ["RECIPE_SNAPSHOT_PATH"] = str(_scratch / "recipe_graph.bin")
+os.environ["GEMINI_API_KEY"] = ""
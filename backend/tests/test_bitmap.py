@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from app.services.bitmap import ARRAY_LIMIT, CompactBitmap
+
+
+def test_add_and_contains_across_chunks():
+    bitmap = CompactBitmap([1, 70_000, 5])
+    assert bitmap.add(9)
+    assert not bitmap.add(5)
+    assert len(bitmap) == 4
+    assert list(bitmap) == [1, 5, 9, 70_000]
+    assert 70_000 in bitmap and 2 not in bitmap
+
+
+def test_bytes_round_trip_for_sparse_and_dense_chunks():
+    dense = range(0, 2 * (ARRAY_LIMIT + 1), 2)
+    bitmap = CompactBitmap([*dense, 1 << 20, (1 << 20) + 3])
+    restored = CompactBitmap.from_bytes(bitmap.to_bytes())
+    assert list(restored) == list(bitmap)
+    assert len(restored) == len(bitmap)
+
+
+def test_empty_round_trip():
+    assert list(CompactBitmap.from_bytes(CompactBitmap().to_bytes())) == []
+
+
+def test_intersection_of_mixed_containers():
+    dense = CompactBitmap(range(ARRAY_LIMIT * 2))
+    sparse = CompactBitmap([3, 4_000, ARRAY_LIMIT * 2 + 1, 70_000])
+    assert list(dense & sparse) == [3, 4_000]
+    assert list(sparse & dense) == [3, 4_000]
+    both = dense & CompactBitmap(range(ARRAY_LIMIT, ARRAY_LIMIT * 3))
+    assert list(both) == list(range(ARRAY_LIMIT, ARRAY_LIMIT * 2))
+    assert len(both) == ARRAY_LIMIT
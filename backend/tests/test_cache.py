@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.cache import ReadThroughCache
+
+
+def test_concurrent_misses_share_one_generation():
+    async def scenario():
+        cache: ReadThroughCache[str, str] = ReadThroughCache(maxsize=8)
+        calls = 0
+
+        async def generate() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_generate("k", lambda: None, generate) for _ in range(5)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert sorted(generated for _, generated in results) == [False] * 4 + [True]
+    assert {value for value, _ in results} == {"value"}
+    assert cache.stats.misses == 1
+    assert cache.stats.coalesced == 4
+
+
+def test_memory_and_database_hits_are_counted():
+    async def scenario():
+        cache: ReadThroughCache[str, str] = ReadThroughCache(maxsize=8)
+
+        async def generate() -> str:
+            raise AssertionError("stored values are not generated")
+
+        first = await cache.get_or_generate("k", lambda: "stored", generate)
+        second = await cache.get_or_generate("k", lambda: "stored", generate)
+        return cache, first, second
+
+    cache, first, second = asyncio.run(scenario())
+    assert first == second == ("stored", False)
+    assert cache.stats.db_hits == 1
+    assert cache.stats.memory_hits == 1
+
+
+def test_lookup_counts_hits_but_not_misses():
+    cache: ReadThroughCache[str, str] = ReadThroughCache(maxsize=8)
+    assert cache.lookup("missing", lambda: None) is None
+    assert cache.lookup("k", lambda: "stored") == "stored"
+    assert cache.lookup("k", lambda: None) == "stored"
+    assert (cache.stats.misses, cache.stats.db_hits, cache.stats.memory_hits) == (0, 1, 1)
+
+
+def test_follower_takes_over_when_the_generator_is_cancelled():
+    async def scenario():
+        cache: ReadThroughCache[str, str] = ReadThroughCache(maxsize=8)
+        started = asyncio.Event()
+        calls = 0
+
+        async def generate() -> str:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                started.set()
+                await asyncio.sleep(10)
+            return "value"
+
+        leader = asyncio.create_task(cache.get_or_generate("k", lambda: None, generate))
+        await started.wait()
+        follower = asyncio.create_task(cache.get_or_generate("k", lambda: None, generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        result = await follower
+        return cache, calls, result
+
+    cache, calls, result = asyncio.run(scenario())
+    assert result == ("value", True)
+    assert calls == 2
+    assert cache.snapshot()["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        cache: ReadThroughCache[str, str] = ReadThroughCache(maxsize=8)
+
+        async def generate() -> str:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            *(cache.get_or_generate("k", lambda: None, generate) for _ in range(3)), return_exceptions=True
+        )
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache.memory) == 0
+    assert cache.snapshot()["in_flight"] == 0
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.gemini import CircuitBreaker, GeminiClient, GeminiError, parse_batch_response
+
+
+def test_breaker_opens_after_threshold_and_stays_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_a_single_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_released_trial_can_be_retried():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def _client(handler, breaker: CircuitBreaker) -> GeminiClient:
+    client = GeminiClient(
+        api_key="test",
+        model="test",
+        endpoint="http://gemini.test/{model}:generateContent",
+        stream_endpoint="http://gemini.test/{model}:streamGenerateContent",
+        timeout_seconds=5,
+        max_concurrency=2,
+        max_retries=0,
+        retry_backoff_seconds=0,
+        breaker=breaker,
+    )
+    client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        httpx.Response(200, content=b"not json"),
+        httpx.Response(503),
+    ],
+)
+def test_failed_trial_reopens_the_breaker(response):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    client = _client(lambda request: response, breaker)
+
+    with pytest.raises(GeminiError):
+        asyncio.run(client.generate_text("prompt"))
+    assert breaker.failures == 2
+    assert breaker.allow()
+
+
+def test_client_errors_count_as_an_answer():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    client = _client(lambda request: httpx.Response(400), breaker)
+
+    with pytest.raises(GeminiError):
+        asyncio.run(client.generate_text("prompt"))
+    assert breaker.state == "closed"
+
+
+def test_batch_response_maps_numbered_lines():
+    answer = "2. 🍵 Çay\n1) 💨 Rüzgar\nNot: bunlar örnek\n1. 🌋 Volkan\n4. 🔥 Fazla"
+    results = parse_batch_response(answer, 3)
+    assert [(result.emoji, result.name) if result else None for result in results] == [
+        ("💨", "Rüzgar"),
+        ("🍵", "Çay"),
+        None,
+    ]
+
+
+def test_batch_response_keeps_only_the_answer_of_echoed_pairs():
+    answer = '1. 💧 ("Su") + 🔥 ("Ateş") -> 🌫 Buhar\n2. 💧 ("Su") + 🌱 ("Toprak") ->'
+    first, second = parse_batch_response(answer, 2)
+    assert (first.emoji, first.name) == ("🌫", "Buhar")
+    assert second is None
+
+
+def test_batch_response_rejects_names_longer_than_the_prompt_allows():
+    answer = "1. 🌋 Bu çok uzun bir isim\n2. 🚌 Dolmuş Şoförü Ahmet"
+    first, second = parse_batch_response(answer, 2)
+    assert first is None
+    assert (second.emoji, second.name) == ("🚌", "Dolmuş Şoförü Ahmet")
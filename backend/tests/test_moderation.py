@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from app.services.moderation import AhoCorasick
+
+
+def test_finds_overlapping_patterns_through_fail_links():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    assert matcher.find("ushers") == ["she", "he", "hers"]
+
+
+def test_suffix_outputs_are_inherited():
+    matcher = AhoCorasick(["abcd", "bc", "c"])
+    assert matcher.find("xabcy") == ["bc", "c"]
+    assert matcher.find("abcd") == ["bc", "c", "abcd"]
+
+
+def test_fail_link_recovers_partial_match():
+    matcher = AhoCorasick(["aab"])
+    assert matcher.find("aaab") == ["aab"]
+
+
+def test_duplicate_and_empty_patterns_are_ignored():
+    matcher = AhoCorasick(["ab", "ab", ""])
+    assert matcher.patterns == ["ab"]
+    assert matcher.find("abab") == ["ab", "ab"]
+    assert matcher.find("") == []
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from app.models import Element
+from app.services.search import ElementSearchIndex
+
+
+def _element(element_id: int, name: str, is_seed: bool = False) -> Element:
+    return Element(id=element_id, name=name, normalized_name=name.casefold(), emoji="✨", is_seed=is_seed)
+
+
+def _ids(entries) -> list[int]:
+    return [entry.id for entry in entries]
+
+
+def test_since_pages_through_the_log_then_reports_new_changes():
+    index = ElementSearchIndex()
+    index.add_many([_element(1, "Su", True), _element(2, "Ateş", True), _element(5, "Buhar")])
+
+    added, removed, cursor, reset = index.since("", limit=2)
+    assert (_ids(added), removed, reset) == ([1, 2], [], True)
+    added, removed, cursor, reset = index.since(cursor, limit=2)
+    assert (_ids(added), removed, cursor, reset) == ([5], [], None, False)
+
+    version = index.version
+    index.add(_element(6, "Çay"))
+    index.remove(5)
+    added, removed, cursor, reset = index.since(version)
+    assert (_ids(added), removed, cursor, reset) == ([6], [5], None, False)
+    assert index.since(index.version) == ([], [], None, False)
+
+
+def test_replay_skips_elements_removed_later():
+    index = ElementSearchIndex()
+    index.add_many([_element(1, "Su", True), _element(5, "Buhar")])
+    index.remove(5)
+    added, removed, _, reset = index.since("")
+    assert (_ids(added), removed, reset) == ([1], [5], True)
+
+
+def test_revisions_from_another_process_reset():
+    index = ElementSearchIndex()
+    other = ElementSearchIndex()
+    index.add(_element(1, "Su", True))
+    other.add_many([_element(1, "Su", True), _element(2, "Ateş", True)])
+
+    for version in (other.version, f"{index.epoch}:99", f"{index.epoch}:x", "garbage"):
+        added, _, _, reset = index.since(version)
+        assert reset, version
+        assert _ids(added) == [1]
+
+
+def test_search_orders_seeds_first_and_pages_by_cursor():
+    index = ElementSearchIndex()
+    index.add_many([_element(7, "Sucuk"), _element(1, "Su", True), _element(3, "Susam")])
+    page, cursor = index.search("su", limit=2)
+    assert (_ids(page), cursor) == ([1, 3], 3)
+    page, cursor = index.search("su", cursor=cursor, limit=2)
+    assert (_ids(page), cursor) == ([7], None)
@@ -2,21 +2,88 @@ import type { CombineResponse, ElementSummary } from '../types';
 
 const API_URL = import.meta.env.VITE_API_URL ?? 'http://localhost:8000';
 
-export async function fetchElements(search?: string): Promise<ElementSummary[]> {
-  const params = search ? `?q=${encodeURIComponent(search)}` : '';
-  const response = await fetch(`${API_URL}/api/elements${params}`);
+export type ElementsPage = { elements: ElementSummary[]; next_cursor: number | null; version: string };
+// `since=` pages also list removed ids; `reset` means the local copy must be rebuilt.
+// Their cursor is the revision to ask for next.
+type CatalogDelta = Omit<ElementsPage, 'next_cursor'> & { next_cursor: string | null; removed: number[]; reset: boolean };
+
+// Local copy of the catalog, kept current with `since=<version>` deltas.
+let catalog: ElementSummary[] = [];
+let catalogVersion = '';
+let catalogEtag: string | null = null;
+
+export async function fetchElements(): Promise<ElementSummary[]> {
+  return syncCatalog();
+}
+
+// One page of matches; pass `next_cursor` back to get the next one.
+export async function searchElements(search: string, cursor: number | null = null): Promise<ElementsPage> {
+  const params = new URLSearchParams({ q: search, limit: '100' });
+  if (cursor !== null) params.set('cursor', String(cursor));
+  return getElementsPage(params);
+}
+
+async function syncCatalog(): Promise<ElementSummary[]> {
+  let since: string | null = catalogVersion;
+  while (since !== null) {
+    const params = new URLSearchParams({ since, limit: '500' });
+    const headers: HeadersInit = catalogEtag ? { 'If-None-Match': catalogEtag } : {};
+    const response = await fetch(`${API_URL}/api/elements?${params}`, { headers });
+    if (response.status === 304) {
+      break;
+    }
+    if (!response.ok) {
+      throw new Error('Failed to fetch elements');
+    }
+    const data = (await response.json()) as CatalogDelta;
+    if (data.reset) {
+      catalog = [];
+    }
+    // Drop removed ids and older copies of re-sent elements so each id appears once.
+    const stale = new Set([...data.removed, ...data.elements.map((element) => element.id)]);
+    if (stale.size > 0) {
+      catalog = catalog.filter((element) => !stale.has(element.id));
+    }
+    catalog = catalog.concat(data.elements);
+    since = data.next_cursor;
+    if (since === null) {
+      catalogVersion = data.version;
+      catalogEtag = response.headers.get('ETag');
+    }
+  }
+  return catalog;
+}
+
+async function getElementsPage(params: URLSearchParams): Promise<ElementsPage> {
+  const response = await fetch(`${API_URL}/api/elements?${params}`);
   if (!response.ok) {
     throw new Error('Failed to fetch elements');
   }
-  const data = (await response.json()) as { elements: ElementSummary[] };
-  return data.elements;
+  return (await response.json()) as ElementsPage;
+}
+
+const SESSION_KEY = 'sonsuz-turkiye:session';
+
+export async function getSessionId(): Promise<string> {
+  const stored = localStorage.getItem(SESSION_KEY);
+  if (stored) {
+    return stored;
+  }
+  const response = await fetch(`${API_URL}/api/session`, { method: 'POST' });
+  if (!response.ok) {
+    throw new Error('Failed to create session');
+  }
+  const { sessionId } = (await response.json()) as { sessionId: string };
+  localStorage.setItem(SESSION_KEY, sessionId);
+  return sessionId;
 }
 
 export async function combineElements(elementA: ElementSummary, elementB: ElementSummary): Promise<CombineResponse> {
+  const sessionId = await getSessionId();
   const response = await fetch(`${API_URL}/api/combine`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ elementA: elementA.emoji + elementA.name, elementB: elementB.emoji + elementB.name})
+    body: JSON.stringify({ elementA: elementA.emoji + elementA.name, elementB: elementB.emoji + elementB.name, sessionId })
   });
   if (!response.ok) {
     const message = await response.text();
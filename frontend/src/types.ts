@@ -1,10 +1,13 @@
 export interface ElementSummary {
+  id: number;
   emoji: string;
   name: string;
+  name_tr: string;
   is_seed: boolean;
 }
 
 export interface CombineResponse {
   element: ElementSummary;
   created: boolean;
+  isNewElementForSession: boolean;
 }